@@ -6,7 +6,6 @@ from stress_detector_model import StressDetector
 import cv2
 import matplotlib.pyplot as plt
 import numpy as np
-from quick_fix import OptimizedStressPredictor
 
 def predict_single_image(model_path, image_path):
     """
@@ -99,9 +98,9 @@ def predict_with_faces(model_path, image_path):
     return results, annotated_img
 
 
-def batch_predict(model_path, image_folder):
+def batch_predict(model_path, image_folder, batch_size=32):
     """
-    Hace predicciones en múltiples imágenes
+    Hace predicciones en múltiples imágenes (una llamada al modelo por lote)
     """
     import os
     from pathlib import Path
@@ -122,24 +121,22 @@ def batch_predict(model_path, image_folder):
     
     results = []
     
-    for img_path in image_files:
-        try:
-            result = detector.predict_stress(str(img_path))
-            result['filename'] = img_path.name
-            results.append(result)
-            
-            # Emoji según clase
-            if result['class'] == 'Non-Stress':
-                status = "✅"
-            elif result['class'] == 'Stress':
-                status = "⚠️"
-            else:
-                status = "🔶"
-            
-            print(f"{status} {img_path.name}: {result['class']} ({result['confidence']:.2%})")
-            
-        except Exception as e:
-            print(f" Error con {img_path.name}: {e}")
+    for img_path, result in zip(image_files, detector.predict_batch(image_files, batch_size=batch_size)):
+        if result is None:
+            print(f" Error con {img_path.name}: No se pudo cargar la imagen")
+            continue
+        result['filename'] = img_path.name
+        results.append(result)
+        
+        # Emoji según clase
+        if result['class'] == 'Non-Stress':
+            status = "✅"
+        elif result['class'] == 'Stress':
+            status = "⚠️"
+        else:
+            status = "🔶"
+        
+        print(f"{status} {img_path.name}: {result['class']} ({result['confidence']:.2%})")
     
     # Resumen
     print("\n" + "="*50)
@@ -14,9 +14,172 @@ import matplotlib.pyplot as plt
 from sklearn.metrics import classification_report, confusion_matrix
 import seaborn as sns
 import cv2
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import os
 
+# Versión del formato de la caché de imágenes (cambiarla invalida las cachés existentes)
+CACHE_VERSION = 1
+
+# Label según Non + 2*Stress: (0,0) inválido, (1,0) Non-Stress, (0,1) Stress, (1,1) Neutral
+_LABEL_LOOKUP = np.array([-1, 0, 1, 2])
+
+
+def decode_image(image_path, img_size):
+    """
+    Lee una imagen y la retorna en RGB uint8 con forma (alto, ancho, 3), o None si no se pudo leer
+    Usa np.fromfile + imdecode para manejar rutas con caracteres especiales en Windows
+    """
+    try:
+        img = cv2.imdecode(np.fromfile(str(image_path), dtype=np.uint8), cv2.IMREAD_COLOR)
+    except (OSError, ValueError):
+        return None
+    if img is None or img.size == 0:
+        return None
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    # cv2.resize recibe (ancho, alto)
+    return cv2.resize(img, (img_size[1], img_size[0]))
+
+
+def _has_input_scaling(model):
+    """True si el modelo escala sus entradas uint8 con una capa Rescaling propia"""
+    return any(isinstance(layer, layers.Rescaling) for layer in model.layers)
+
+
+def _saved_input_scaling(filepath):
+    """
+    True si la configuración guardada en el .h5 incluye la capa Rescaling.
+    Sin configuración legible se asume un modelo anterior (escalado externo / 255)
+    """
+    try:
+        import h5py
+        with h5py.File(filepath, 'r') as f:
+            config = f.attrs.get('model_config')
+    except Exception:
+        return False
+    if isinstance(config, bytes):
+        config = config.decode('utf-8')
+    return config is not None and '"Rescaling"' in config
+
+
+def make_dataset(images, labels=None, batch_size=32, shuffle=False, seed=None):
+    """
+    tf.data.Dataset por lotes sobre un array de imágenes uint8 (p. ej. el memmap de la caché)
+    Solo se copian del array los lotes que se van consumiendo, así que la memoria no
+    depende del tamaño del dataset; los lotes salen en uint8 (el modelo los escala)
+    
+    Args:
+        images: Array (n, alto, ancho, 3) uint8
+        labels: Labels (n,) o None para predicción
+        shuffle: Barajar los índices en cada época
+    """
+    n = len(images)
+    shape = tuple(images.shape[1:])
+    
+    def gather(idx):
+        return np.ascontiguousarray(images[idx])
+    
+    def load(idx):
+        # Índices ordenados: lecturas secuenciales sobre el memmap
+        idx = tf.sort(idx)
+        batch = tf.numpy_function(gather, [idx], tf.uint8)
+        batch.set_shape((None, *shape))
+        if labels is None:
+            return batch
+        return batch, tf.gather(label_tensor, idx)
+    
+    if labels is not None:
+        label_tensor = tf.constant(np.asarray(labels, dtype=np.int64))
+    ds = tf.data.Dataset.range(n)
+    if shuffle:
+        ds = ds.shuffle(n, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(load, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+def make_file_dataset(paths, labels=None, img_size=(224, 224), batch_size=32,
+                      shuffle=False, cache=False, seed=None):
+    """
+    tf.data.Dataset por lotes (uint8) que decodifica y redimensiona las imágenes desde
+    disco en paralelo, sin caché previa
+    
+    Args:
+        paths: Rutas de las imágenes
+        labels: Labels o None para predicción
+        cache: True guarda en memoria las imágenes decodificadas (uint8) tras la
+            primera época; una ruta las guarda en disco
+    """
+    n = len(paths)
+    
+    def decode(path):
+        img = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        img = tf.image.resize(img, img_size)
+        return tf.cast(tf.clip_by_value(tf.round(img), 0, 255), tf.uint8)
+    
+    if labels is None:
+        ds = tf.data.Dataset.from_tensor_slices([str(p) for p in paths])
+        decode_item = decode
+    else:
+        ds = tf.data.Dataset.from_tensor_slices(([str(p) for p in paths], np.asarray(labels, dtype=np.int64)))
+        decode_item = lambda path, label: (decode(path), label)
+    
+    if cache is not False:
+        ds = ds.map(decode_item, num_parallel_calls=tf.data.AUTOTUNE)
+        ds = ds.cache('' if cache is True else cache)
+        if shuffle:
+            ds = ds.shuffle(n, seed=seed, reshuffle_each_iteration=True)
+    else:
+        # Sin caché se barajan las rutas (baratas) antes de decodificar
+        if shuffle:
+            ds = ds.shuffle(n, seed=seed, reshuffle_each_iteration=True)
+        ds = ds.map(decode_item, num_parallel_calls=tf.data.AUTOTUNE)
+    
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def _as_dataset(X, y=None, batch_size=32, shuffle=False):
+    """Acepta un tf.data.Dataset ya armado o un array de imágenes uint8"""
+    if isinstance(X, tf.data.Dataset):
+        return X
+    return make_dataset(X, y, batch_size=batch_size, shuffle=shuffle)
+
+
+def _cache_key(data_dir, csv_path, filenames, img_size):
+    """
+    Clave de la caché de un split: cambia si cambia el CSV, el tamaño de imagen
+    o el mtime/tamaño de alguna de las imágenes listadas
+    """
+    h = hashlib.sha1(f"v{CACHE_VERSION}|{tuple(img_size)}".encode())
+    with open(csv_path, 'rb') as f:
+        h.update(f.read())
+    for name in filenames:
+        try:
+            st = os.stat(os.path.join(data_dir, name))
+            h.update(f"{name}|{st.st_mtime_ns}|{st.st_size}\n".encode())
+        except OSError:
+            h.update(f"{name}|-\n".encode())
+    return h.hexdigest()[:16]
+
+
+def _save_cache(prefix, images, labels, filenames):
+    """
+    Guarda un split preprocesado (imágenes uint8, labels, filenames) y borra las
+    versiones anteriores del mismo split. filenames se escribe al final: marca la caché como completa
+    """
+    cache_dir = os.path.dirname(prefix)
+    os.makedirs(cache_dir, exist_ok=True)
+    split = os.path.basename(prefix).rsplit('_', 1)[0]
+    for name in os.listdir(cache_dir):
+        if name.startswith(split + '_') and not name.startswith(os.path.basename(prefix)):
+            os.remove(os.path.join(cache_dir, name))
+    for suffix, array in (('images', images), ('labels', labels), ('filenames', np.array(filenames, dtype=str))):
+        path = f"{prefix}.{suffix}.npy"
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(path + '.tmp', path)
+
+
 class StressDetector:
     """
     Detector de estrés usando CNN con Transfer Learning
@@ -32,6 +195,9 @@ class StressDetector:
         self.num_classes = 3  # Non-Stress, Stress y Neutral
         self.model = None
         self.history = None
+        # Los modelos construidos aquí reciben uint8 [0, 255] y escalan en su primera
+        # capa; los .h5 anteriores esperan la imagen ya dividida entre 255
+        self.scales_input = True
         
         # Mapeo de clases
         self.class_labels = {
@@ -40,16 +206,20 @@ class StressDetector:
             2: 'Neutral'
         }
         
-    def load_data_from_csv(self, data_dir, csv_file='_classes.csv'):
+    def load_data_from_csv(self, data_dir, csv_file='_classes.csv', num_workers=None,
+                           cache_dir=None):
         """
         Carga las imágenes y labels desde el CSV de Roboflow
         
         Args:
             data_dir: Directorio con las imágenes y el CSV
             csv_file: Nombre del archivo CSV
+            num_workers: Hilos para decodificar imágenes (None = núcleos disponibles)
+            cache_dir: Directorio de caché de imágenes preprocesadas (None = sin caché)
             
         Returns:
-            images, labels, filenames
+            images (uint8, memmap si viene de la caché), labels, filenames
+            El escalado lo hace la primera capa del modelo (ver build_model)
         """
         # Normalizar ruta para compatibilidad Windows/Linux
         data_dir = os.path.normpath(data_dir)
@@ -76,73 +246,24 @@ class StressDetector:
         
         df = pd.read_csv(csv_path)
         
-        images = []
-        labels = []
-        filenames = []
-        skipped = {'not_found': 0, 'load_error': 0, 'invalid_label': 0}
-        
         print(f"\n Cargando datos desde: {data_dir}")
         print(f"   Total de imágenes en CSV: {len(df)}")
         
-        for idx, row in df.iterrows():
-            img_path = os.path.join(data_dir, row['filename'])
-            
-            if not os.path.exists(img_path):
-                skipped['not_found'] += 1
-                if skipped['not_found'] <= 3:
-                    print(f"  Imagen no encontrada: {img_path}")
-                continue
-            
-            # Interpretar label correctamente
-            # Non=1, Stress=0 → label=0 (Non-Stress)
-            # Non=0, Stress=1 → label=1 (Stress)
-            # Non=1, Stress=1 → label=2 (Neutral)
-            # Non=0, Stress=0 → inválido (skip)
-            
-            non_val = row['Non']
-            stress_val = row['Stress']
-            
-            # Validar combinación
-            if non_val == 1 and stress_val == 0:
-                label = 0  # Non-Stress
-            elif non_val == 0 and stress_val == 1:
-                label = 1  # Stress
-            elif non_val == 1 and stress_val == 1:
-                label = 2  # Neutral
-            else:
-                # Caso inválido (Non=0, Stress=0)
-                skipped['invalid_label'] += 1
-                if skipped['invalid_label'] <= 3:
-                    print(f"  Label inválido (Non={non_val}, Stress={stress_val}): {row['filename']}")
-                continue
-            
-            # Cargar imagen
-            img = cv2.imread(img_path)
-            if img is None:
-                skipped['load_error'] += 1
-                if skipped['load_error'] <= 3:
-                    print(f"  Error al cargar: {img_path}")
-                continue
-                
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            img = cv2.resize(img, self.img_size)
-            
-            images.append(img)
-            labels.append(label)
-            filenames.append(row['filename'])
-        
-        images = np.array(images, dtype=np.float32) / 255.0
-        labels = np.array(labels)
+        cache_prefix = None
+        if cache_dir is not None:
+            key = _cache_key(data_dir, csv_path, df['filename'], self.img_size)
+            cache_prefix = os.path.join(cache_dir, f"{os.path.basename(data_dir)}_{key}")
         
-        # Mostrar imágenes saltadas
-        if sum(skipped.values()) > 0:
-            print(f"\n  Imágenes saltadas:")
-            if skipped['not_found'] > 0:
-                print(f"   - No encontradas: {skipped['not_found']}")
-            if skipped['load_error'] > 0:
-                print(f"   - Error al cargar: {skipped['load_error']}")
-            if skipped['invalid_label'] > 0:
-                print(f"   - Labels inválidos/ambiguos: {skipped['invalid_label']}")
+        if cache_prefix is not None and os.path.exists(cache_prefix + '.filenames.npy'):
+            images = np.load(cache_prefix + '.images.npy', mmap_mode='r')
+            labels = np.load(cache_prefix + '.labels.npy')
+            filenames = np.load(cache_prefix + '.filenames.npy').tolist()
+            print(f"   Cargado desde caché: {cache_prefix}")
+        else:
+            images, labels, filenames = self._decode_split(data_dir, df, num_workers)
+            if cache_prefix is not None:
+                _save_cache(cache_prefix, images, labels, filenames)
+                print(f"   Caché guardada en: {cache_prefix}")
         
         # Estadísticas
         non_stress = np.sum(labels == 0)
@@ -157,6 +278,83 @@ class StressDetector:
         print(f"   Neutral: {neutral} ({neutral/total*100:.1f}%)")
         
         return images, labels, filenames
+    
+    def _decode_split(self, data_dir, df, num_workers=None):
+        """
+        Decodifica las imágenes listadas en el CSV
+        
+        Returns:
+            images (uint8), labels, filenames de las filas válidas
+        """
+        skipped = {'not_found': 0, 'load_error': 0, 'invalid_label': 0}
+        paths = [os.path.join(data_dir, name) for name in df['filename'].to_numpy()]
+        
+        # Mismo orden de comprobaciones que antes: existencia, label y por último la carga
+        exists = np.fromiter((os.path.exists(path) for path in paths), dtype=bool, count=len(paths))
+        for idx in np.flatnonzero(~exists):
+            skipped['not_found'] += 1
+            if skipped['not_found'] <= 3:
+                print(f"  Imagen no encontrada: {paths[idx]}")
+        
+        # Interpretar labels de forma vectorizada (índice = Non + 2*Stress)
+        # Non=1, Stress=0 → label=0 (Non-Stress)
+        # Non=0, Stress=1 → label=1 (Stress)
+        # Non=1, Stress=1 → label=2 (Neutral)
+        # Non=0, Stress=0 → inválido (skip)
+        # Las columnas pueden llegar como float (1.0, o NaN si la celda está vacía):
+        # se valida que sean 0/1 antes de convertirlas a enteros para indexar
+        non_vals = df['Non'].to_numpy()
+        stress_vals = df['Stress'].to_numpy()
+        binary = np.isin(non_vals, (0, 1)) & np.isin(stress_vals, (0, 1))
+        all_labels = np.full(len(df), -1, dtype=np.int64)
+        all_labels[binary] = _LABEL_LOOKUP[non_vals[binary].astype(np.int64)
+                                           + 2 * stress_vals[binary].astype(np.int64)]
+        
+        for idx in np.flatnonzero(exists & (all_labels < 0)):
+            skipped['invalid_label'] += 1
+            if skipped['invalid_label'] <= 3:
+                print(f"  Label inválido (Non={non_vals[idx]}, Stress={stress_vals[idx]}): {df['filename'].iloc[idx]}")
+        
+        # Decodificar y redimensionar en paralelo, escribiendo directo en un array uint8
+        # (cv2 libera el GIL, así que los hilos escalan con los núcleos)
+        valid_idx = np.flatnonzero(exists & (all_labels >= 0))
+        candidates = [paths[idx] for idx in valid_idx]
+        images = np.empty((len(candidates), *self.img_size, 3), dtype=np.uint8)
+        
+        def load_into(i):
+            img = decode_image(candidates[i], self.img_size)
+            if img is None:
+                return 'load_error'
+            images[i] = img
+            return None
+        
+        with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count()) as pool:
+            status = list(pool.map(load_into, range(len(candidates))))
+        
+        for path, problem in zip(candidates, status):
+            if problem is not None:
+                skipped[problem] += 1
+                if skipped[problem] <= 3:
+                    print(f"  Error al cargar: {path}")
+        
+        loaded = np.array([problem is None for problem in status], dtype=bool)
+        if not loaded.all():
+            images = images[loaded]
+        labels = all_labels[valid_idx[loaded]]
+        filenames = df['filename'].to_numpy()[valid_idx[loaded]].tolist()
+        
+        # Mostrar imágenes saltadas
+        if sum(skipped.values()) > 0:
+            print(f"\n  Imágenes saltadas:")
+            if skipped['not_found'] > 0:
+                print(f"   - No encontradas: {skipped['not_found']}")
+            if skipped['load_error'] > 0:
+                print(f"   - Error al cargar: {skipped['load_error']}")
+            if skipped['invalid_label'] > 0:
+                print(f"   - Labels inválidos/ambiguos: {skipped['invalid_label']}")
+        
+        return images, labels, filenames
+    
     def _convert_to_rgb(self, img):
         """
         Convierte imagen a RGB independientemente del formato original
@@ -177,6 +375,8 @@ class StressDetector:
     def build_model(self, use_transfer_learning=True):
         """
         Construye el modelo CNN con o sin Transfer Learning
+        La entrada son imágenes RGB uint8 en [0, 255]; una única capa Rescaling al
+        inicio hace el escalado, igual en entrenamiento y en predicción
         """
         if use_transfer_learning:
             # Usar MobileNetV2 preentrenado (eficiente)
@@ -192,8 +392,8 @@ class StressDetector:
             # Construir el modelo completo
             inputs = keras.Input(shape=(*self.img_size, 3))
             
-            # Preprocesamiento para MobileNetV2
-            x = keras.applications.mobilenet_v2.preprocess_input(inputs)
+            # Preprocesamiento para MobileNetV2: [0, 255] → [-1, 1] (como preprocess_input)
+            x = layers.Rescaling(1 / 127.5, offset=-1)(inputs)
             
             # Base model
             x = base_model(x, training=False)
@@ -217,9 +417,12 @@ class StressDetector:
         else:
             # Modelo CNN desde cero
             self.model = models.Sequential([
+                layers.Input(shape=(*self.img_size, 3)),
+                # Escalado: [0, 255] → [0, 1]
+                layers.Rescaling(1 / 255),
+                
                 # Bloque 1
-                layers.Conv2D(64, (3, 3), activation='relu', 
-                            input_shape=(*self.img_size, 3)),
+                layers.Conv2D(64, (3, 3), activation='relu'),
                 layers.BatchNormalization(),
                 layers.MaxPooling2D((2, 2)),
                 layers.Dropout(0.25),
@@ -253,6 +456,7 @@ class StressDetector:
                 layers.Dense(self.num_classes, activation='softmax')
             ])
         
+        self.scales_input = True
         print("\n  Modelo construido exitosamente")
         return self.model
     
@@ -273,6 +477,10 @@ class StressDetector:
               batch_size=32, checkpoint_path='best_stress_model.h5'):
         """
         Entrena el modelo con callbacks
+        
+        X_train / X_val pueden ser arrays uint8 (se leen por lotes con make_dataset)
+        o un tf.data.Dataset ya armado (p. ej. make_file_dataset); y_train se usa
+        para los class weights y la validación de labels
         """
         # Calcular class weights para manejar desbalance
         from sklearn.utils.class_weight import compute_class_weight
@@ -326,8 +534,8 @@ class StressDetector:
         print(f"\n Iniciando entrenamiento...")
         print(f"   Epochs: {epochs}")
         print(f"   Batch size: {batch_size}")
-        print(f"   Train samples: {len(X_train)}")
-        print(f"   Validation samples: {len(X_val)}")
+        print(f"   Train samples: {len(y_train)}")
+        print(f"   Validation samples: {len(y_val)}")
         
         # Validar que los labels estén en el rango correcto
         print(f"\n Validando datos...")
@@ -342,11 +550,16 @@ class StressDetector:
         
         print(f"    Validación exitosa")
         
+        train_ds = _as_dataset(X_train, y_train, batch_size, shuffle=True)
+        val_ds = _as_dataset(X_val, y_val, batch_size)
+        if not self.scales_input:
+            train_ds = train_ds.map(lambda x, y: (self._model_input(x), y))
+            val_ds = val_ds.map(lambda x, y: (self._model_input(x), y))
+        
         self.history = self.model.fit(
-            X_train, y_train,
-            validation_data=(X_val, y_val),
+            train_ds,
+            validation_data=val_ds,
             epochs=epochs,
-            batch_size=batch_size,
             class_weight=class_weight_dict,
             callbacks=callbacks,
             verbose=1
@@ -391,11 +604,14 @@ class StressDetector:
         print("\n  Evaluando modelo en conjunto de prueba...")
         
         # Predicciones
-        predictions = self.model.predict(X_test, verbose=0)
+        test_ds = X_test if isinstance(X_test, tf.data.Dataset) else make_dataset(X_test, y_test)
+        if not self.scales_input:
+            test_ds = test_ds.map(lambda x, y: (self._model_input(x), y))
+        predictions = self.model.predict(test_ds.map(lambda x, y: x), verbose=0)
         y_pred = np.argmax(predictions, axis=1)
         
         # Métricas generales
-        test_loss, test_acc = self.model.evaluate(X_test, y_test, verbose=0)
+        test_loss, test_acc = self.model.evaluate(test_ds, verbose=0)
         
         print(f"\n Métricas en Test Set:")
         print(f"   Accuracy:  {test_acc:.4f}")
@@ -438,6 +654,12 @@ class StressDetector:
         
         return y_pred, predictions
     
+    def _model_input(self, images):
+        """Lote uint8 tal como lo espera el modelo cargado (escalado solo para modelos anteriores)"""
+        if self.scales_input:
+            return images
+        return tf.cast(images, tf.float32) / 255.0 if tf.is_tensor(images) else images.astype(np.float32) / 255.0
+    
     def predict_stress(self, image_path):
         """
         Predice la clase de una imagen (Non-Stress, Stress o Neutral)
@@ -464,25 +686,101 @@ class StressDetector:
         
         img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         img_resized = cv2.resize(img, self.img_size)
-        img_array = np.expand_dims(img_resized, axis=0) / 255.0
+        img_array = self._model_input(np.expand_dims(img_resized, axis=0))
         
         # Predicción
         predictions = self.model.predict(img_array, verbose=0)[0]
-        class_idx = np.argmax(predictions)
-        confidence = predictions[class_idx]
-        
-        result = {
+        return self._result(predictions)
+    
+    def _result(self, predictions):
+        """dict de resultado a partir de las probabilidades de una imagen"""
+        class_idx = int(np.argmax(predictions))
+        return {
             'class': self.class_labels[class_idx],
-            'class_id': int(class_idx),
-            'confidence': float(confidence),
+            'class_id': class_idx,
+            'confidence': float(predictions[class_idx]),
             'probabilities': {
                 'Non-Stress': float(predictions[0]),
                 'Stress': float(predictions[1]),
                 'Neutral': float(predictions[2])
             }
         }
+    
+    def _load_for_batch(self, source):
+        """
+        Ruta o array → imagen RGB (alto, ancho, 3) uint8, o None si no se pudo usar
+        Los arrays en escala de grises o RGBA se pasan a RGB; otro tipo o forma
+        cuenta igual que un archivo ilegible
+        """
+        if not isinstance(source, np.ndarray):
+            return decode_image(source, self.img_size)
+        if source.dtype != np.uint8 or source.size == 0:
+            return None
+        if source.ndim == 3 and source.shape[2] == 1:
+            source = source[:, :, 0]
+        if source.ndim == 2:
+            source = cv2.cvtColor(source, cv2.COLOR_GRAY2RGB)
+        elif source.ndim == 3 and source.shape[2] == 4:
+            source = cv2.cvtColor(source, cv2.COLOR_RGBA2RGB)
+        elif source.ndim != 3 or source.shape[2] != 3:
+            return None
+        if source.shape[:2] != tuple(self.img_size):
+            source = cv2.resize(source, (self.img_size[1], self.img_size[0]))
+        return source
+    
+    def predict_batch(self, sources, batch_size=32, num_workers=None):
+        """
+        Predice la clase de muchas imágenes con una llamada al modelo por lote
+        Las imágenes se decodifican en paralelo; mientras el modelo evalúa un lote
+        ya se decodifica el siguiente
+        
+        Args:
+            sources: Lista de rutas o de arrays uint8 RGB, RGBA o en escala de grises
+                (se redimensionan si hace falta)
+            batch_size: Imágenes por llamada al modelo (el último lote se rellena
+                para que todas las llamadas tengan la misma forma)
+            num_workers: Hilos para decodificar (None = núcleos disponibles)
+            
+        Returns:
+            Lista alineada con sources: el mismo dict que predict_stress, o None si
+            la imagen no se pudo cargar o decodificar (el resto del lote sigue)
+        """
+        sources = list(sources)
+        results = [None] * len(sources)
+        buffers = [np.zeros((batch_size, *self.img_size, 3), dtype=np.uint8) for _ in range(2)]
         
-        return result
+        def load_into(buffer, slot, index):
+            try:
+                img = self._load_for_batch(sources[index])
+            except (cv2.error, ValueError, TypeError, OSError):
+                img = None
+            if img is None:
+                return False
+            buffer[slot] = img
+            return True
+        
+        def submit(pool, k):
+            start = k * batch_size
+            indices = range(start, min(start + batch_size, len(sources)))
+            buffer = buffers[k % 2]
+            return indices, [pool.submit(load_into, buffer, slot, i) for slot, i in enumerate(indices)]
+        
+        n_batches = -(-len(sources) // batch_size)
+        with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count()) as pool:
+            pending = submit(pool, 0) if n_batches else None
+            for k in range(n_batches):
+                indices, futures = pending
+                loaded = [f.result() for f in futures]
+                if k + 1 < n_batches:
+                    pending = submit(pool, k + 1)
+                if not any(loaded):
+                    continue
+                predictions = np.asarray(self.model.predict_on_batch(self._model_input(buffers[k % 2])))
+                for slot, i in enumerate(indices):
+                    if loaded[slot]:
+                        results[i] = self._result(predictions[slot])
+        
+        return results
     
     def predict_with_face_detection(self, image_path):
         """
@@ -512,7 +810,7 @@ class StressDetector:
             face_rgb = self._convert_to_rgb(face_roi)
             face_rgb = self._convert_to_rgb(face_roi)
             face_resized = cv2.resize(face_rgb, self.img_size)
-            face_array = np.expand_dims(face_resized, axis=0) / 255.0
+            face_array = self._model_input(np.expand_dims(face_resized, axis=0))
             
             # Predicción
             predictions = self.model.predict(face_array, verbose=0)[0]
@@ -560,6 +858,7 @@ class StressDetector:
         try:
             # Intentar cargar con compile=False para evitar problemas de compatibilidad
             self.model = keras.models.load_model(filepath, compile=False)
+            self.scales_input = _has_input_scaling(self.model)
             # Recompilar el modelo manualmente
             self.model.compile(
                 optimizer='adam',
@@ -567,6 +866,8 @@ class StressDetector:
                 metrics=['accuracy']
             )
             print(f"\n Modelo cargado desde: {filepath}")
+            if not self.scales_input:
+                print("   Modelo anterior sin capa Rescaling: las imágenes se dividen entre 255")
         except Exception as e:
             print(f"\n Error al cargar modelo: {e}")
             print("Intentando método alternativo...")
@@ -574,22 +875,30 @@ class StressDetector:
             try:
                 self.build_model()
                 self.model.load_weights(filepath)
+                # build_model deja scales_input=True, pero los pesos de un modelo anterior
+                # se entrenaron con la entrada dividida entre 255 antes de su preprocess_input
+                self.scales_input = _saved_input_scaling(filepath)
                 print(f"\n Pesos del modelo cargados desde: {filepath}")
+                if not self.scales_input:
+                    print("   Pesos de un modelo anterior sin capa Rescaling: las imágenes se dividen entre 255")
             except Exception as e2:
                 print(f"\n Error al cargar pesos: {e2}")
                 raise
 
 
 # Función auxiliar para cargar todos los conjuntos de datos
-def load_all_datasets(data_root='data2'):
+def load_all_datasets(data_root='data2', use_cache=True):
     """
     Carga train, valid y test desde el directorio raíz
+    Con use_cache las imágenes ya redimensionadas se guardan en <data_root>/.cache
+    y solo se vuelven a decodificar si cambian el CSV o las imágenes
     """
     detector = StressDetector()
+    cache_dir = os.path.join(data_root, '.cache') if use_cache else None
     
     # Cargar datos
-    X_train, y_train, _ = detector.load_data_from_csv(os.path.join(data_root, 'train'))
-    X_val, y_val, _ = detector.load_data_from_csv(os.path.join(data_root, 'valid'))
-    X_test, y_test, _ = detector.load_data_from_csv(os.path.join(data_root, 'test'))
+    X_train, y_train, _ = detector.load_data_from_csv(os.path.join(data_root, 'train'), cache_dir=cache_dir)
+    X_val, y_val, _ = detector.load_data_from_csv(os.path.join(data_root, 'valid'), cache_dir=cache_dir)
+    X_test, y_test, _ = detector.load_data_from_csv(os.path.join(data_root, 'test'), cache_dir=cache_dir)
     
     return (X_train, y_train), (X_val, y_val), (X_test, y_test)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Actualización incremental del modelo con ventanas etiquetadas nuevas
+En lugar de reentrenar desde el notebook, continúa el boosting del modelo actual:
+- El scaler (y el paso SMOTE, si lo hay) se conservan tal cual, para que los
+  árboles existentes sigan recibiendo las mismas entradas
+- Se añaden unos pocos árboles entrenados solo con las ventanas nuevas
+- El resultado se guarda como una versión nueva del artefacto (_v<N+1>.pkl) junto
+  a un .json con su procedencia; el archivo original no se modifica
+
+Uso:
+    python actualizacion_modelo.py <ventanas.csv> [--modelo best_wesad_xgboost_con_smote_model_v2.pkl] [--arboles 20]
+El CSV (o .npz) debe tener las columnas bvp, eda, temp y stress (0/1).
+"""
+
+import copy
+import datetime
+import json
+import os
+import re
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from xgboost import XGBClassifier
+
+from entrenamiento_wesad import PARAMETROS_XGB
+from registro_modelos import hash_archivo
+from stress_model import FEATURES, load_model
+
+# Árboles añadidos por actualización: pocos para adaptar sin olvidar lo aprendido
+ARBOLES_ACTUALIZACION = 20
+
+
+def cargar_ventanas(ruta, features=FEATURES):
+    """Lee ventanas etiquetadas de un CSV o .npz; retorna (X (n, len(features)), y (n,))."""
+    if ruta.endswith('.npz'):
+        with np.load(ruta) as datos:
+            X = np.column_stack([datos[f] for f in features])
+            y = datos['stress']
+    else:
+        df = pd.read_csv(ruta)
+        X = df[features].to_numpy()
+        y = df['stress'].to_numpy()
+    return X.astype(np.float64), y.astype(np.int64)
+
+
+def actualizar_modelo(pipeline, X, y, arboles=ARBOLES_ACTUALIZACION, parametros=None):
+    """
+    Continúa el boosting del pipeline con ventanas nuevas.
+
+    Parámetros:
+    - pipeline: Pipeline entrenado (scaler [+ smote] + XGBClassifier)
+    - X: Ventanas nuevas (n, 3) en el orden de FEATURES
+    - y: Etiquetas 0/1
+    - arboles: Árboles a añadir
+    - parametros: Hiperparámetros XGBoost (por defecto PARAMETROS_XGB)
+
+    Retorna:
+    - Pipeline nuevo (el original no se modifica)
+    """
+    y = np.asarray(y)
+    parametros = dict(PARAMETROS_XGB, **(parametros or {}))
+    parametros.pop('n_estimators')
+    parametros['seed'] = parametros.pop('random_state')
+    parametros['objective'] = 'binary:logistic'
+    positivos = int(np.count_nonzero(y))
+    if 0 < positivos < len(y):
+        parametros.setdefault('scale_pos_weight', (len(y) - positivos) / positivos)
+
+    scaler = pipeline.named_steps['scaler']
+    X_escalado = scaler.transform(pd.DataFrame(X, columns=FEATURES))
+    datos = xgb.DMatrix(X_escalado, label=y)
+
+    anterior = pipeline.named_steps['classifier'].get_booster()
+    booster = xgb.train(parametros, datos, num_boost_round=arboles, xgb_model=anterior)
+
+    clasificador = XGBClassifier()
+    clasificador.load_model(bytearray(booster.save_raw('ubj')))
+    nuevo = copy.deepcopy(pipeline)
+    nuevo.steps[-1] = (nuevo.steps[-1][0], clasificador)
+    return nuevo
+
+
+def siguiente_version(ruta_modelo):
+    """modelo_v2.pkl -> modelo_v3.pkl (o el primer _v<N> libre); modelo.pkl -> modelo_v2.pkl."""
+    base, extension = os.path.splitext(ruta_modelo)
+    coincidencia = re.search(r'_v(\d+)$', base)
+    if coincidencia:
+        base, version = base[:coincidencia.start()], int(coincidencia.group(1)) + 1
+    else:
+        version = 2
+    while os.path.exists(f"{base}_v{version}{extension}"):
+        version += 1
+    return f"{base}_v{version}{extension}"
+
+
+def guardar_version(pipeline, ruta_modelo_base, ventanas, arboles, segundos):
+    """Guarda el pipeline como versión nueva y escribe su procedencia en un .json al lado."""
+    ruta = siguiente_version(ruta_modelo_base)
+    joblib.dump(pipeline, ruta)
+    procedencia = {
+        'base': os.path.basename(ruta_modelo_base),
+        'sha256_base': hash_archivo(ruta_modelo_base),
+        'arboles_nuevos': arboles,
+        'arboles_totales': pipeline.named_steps['classifier'].get_booster().num_boosted_rounds(),
+        'ventanas': int(ventanas),
+        'segundos_entrenamiento': round(segundos, 3),
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(os.path.splitext(ruta)[0] + '.json', 'w') as f:
+        json.dump(procedencia, f, indent=2)
+    return ruta
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    def argumento(nombre, defecto):
+        if nombre in sys.argv:
+            return sys.argv[sys.argv.index(nombre) + 1]
+        return defecto
+
+    ruta_modelo = argumento('--modelo', 'best_wesad_xgboost_con_smote_model_v2.pkl')
+    arboles = int(argumento('--arboles', ARBOLES_ACTUALIZACION))
+
+    pipeline = load_model(ruta_modelo)
+    X, y = cargar_ventanas(sys.argv[1])
+    print(f"Ventanas nuevas: {len(y)} | estrés: {int(y.sum())}")
+
+    antes = (pipeline.predict(pd.DataFrame(X, columns=FEATURES)) == y).mean()
+    inicio = time.perf_counter()
+    nuevo = actualizar_modelo(pipeline, X, y, arboles)
+    segundos = time.perf_counter() - inicio
+    despues = (nuevo.predict(pd.DataFrame(X, columns=FEATURES)) == y).mean()
+
+    ruta = guardar_version(nuevo, ruta_modelo, len(y), arboles, segundos)
+    print(f"Actualización en {segundos:.2f} s | accuracy en las ventanas nuevas: {antes:.3f} -> {despues:.3f}")
+    print(f"Modelo guardado en {ruta}")
@@ -0,0 +1,299 @@
+# Exportación y evaluación vectorizada del pipeline XGBoost sin pasar por sklearn.
+#
+# El pipeline guardado es StandardScaler -> SMOTE (solo en fit) -> XGBClassifier
+# sobre 3 características. Aquí se aplana en arrays NumPy:
+#   - media / escala del scaler
+#   - por nodo: característica, umbral, hijo izquierdo, hijo derecho, default_left, valor hoja
+# y al cargar cada árbol se tabula sobre la rejilla de sus umbrales, de modo que
+# un lote se evalúa con unos pocos gathers NumPy en lugar de Pipeline + DMatrix.
+#
+# Uso: python arbol_compilado.py [ventanas_reservadas.csv]
+#   exporta best_wesad_xgboost_compilado.npz y verifica la paridad con el .pkl
+#   (sin CSV, sobre lecturas aleatorias en los rangos de muñeca)
+# La prueba reproducible de paridad, sobre filas del constructor de shards, está en
+# test_arbol_compilado.py
+
+import json
+import numpy as np
+
+from registro_modelos import obtener_modelo
+from stress_model import FEATURES, UMBRAL_ESTRES
+
+
+def _arrays_desde_booster(booster):
+    """
+    Convierte el JSON interno del booster en arrays planos.
+    Los nodos de todos los árboles se concatenan; raices[t] es el índice
+    global de la raíz del árbol t. En las hojas ambos hijos apuntan al
+    propio nodo, así el recorrido puede avanzar un número fijo de pasos.
+    """
+    modelo = json.loads(booster.save_raw('json'))['learner']
+
+    objetivo = modelo['objective']['name']
+    if objetivo != 'binary:logistic':
+        raise ValueError(f"Solo se soporta 'binary:logistic', el modelo usa '{objetivo}'")
+
+    base_score = float(modelo['learner_model_param']['base_score'].strip('[]'))
+    arboles = modelo['gradient_booster']['model']['trees']
+
+    caracteristica, umbral, izquierdo, derecho, default_left = [], [], [], [], []
+    raices = []
+    profundidad_max = 0
+    desplazamiento = 0
+
+    for arbol in arboles:
+        izq = np.asarray(arbol['left_children'], dtype=np.int32)
+        der = np.asarray(arbol['right_children'], dtype=np.int32)
+        n_nodos = len(izq)
+        es_hoja = izq == -1
+        propios = np.arange(n_nodos, dtype=np.int32)
+
+        izquierdo.append(np.where(es_hoja, propios, izq) + desplazamiento)
+        derecho.append(np.where(es_hoja, propios, der) + desplazamiento)
+        caracteristica.append(np.asarray(arbol['split_indices'], dtype=np.int32))
+        # En las hojas split_conditions guarda el valor de la hoja (ya con learning_rate)
+        umbral.append(np.asarray(arbol['split_conditions'], dtype=np.float32))
+        default_left.append(np.asarray(arbol['default_left'], dtype=bool))
+
+        # Profundidad del árbol siguiendo los padres
+        profundidad = np.zeros(n_nodos, dtype=np.int32)
+        for nodo in range(1, n_nodos):
+            profundidad[nodo] = profundidad[arbol['parents'][nodo]] + 1
+        profundidad_max = max(profundidad_max, int(profundidad.max()))
+
+        raices.append(desplazamiento)
+        desplazamiento += n_nodos
+
+    return {
+        'caracteristica': np.concatenate(caracteristica),
+        'umbral': np.concatenate(umbral),
+        'izquierdo': np.concatenate(izquierdo),
+        'derecho': np.concatenate(derecho),
+        'default_left': np.concatenate(default_left),
+        'raices': np.asarray(raices, dtype=np.int32),
+        'profundidad_max': np.int32(profundidad_max),
+        'base_margin': np.float32(np.log(base_score / (1.0 - base_score))),
+    }
+
+
+class ModeloCompilado:
+    """
+    Evaluador vectorizado del pipeline exportado.
+    Expone predict / predict_proba con la misma forma que el pipeline de
+    sklearn, así que puede pasarse a predict_stress_batch como 'pipeline'.
+
+    Con solo 3 características cada árbol es constante por tramos sobre una
+    rejilla pequeña (sus umbrales por característica), así que al cargar se
+    tabula cada árbol y la predicción queda en: 3 searchsorted por lote, una
+    suma de índices y un gather por árbol.
+    """
+
+    # Filas por bloque al evaluar lotes grandes (acota la memoria de (árboles, filas))
+    TAM_BLOQUE = 8192
+
+    def __init__(self, arrays):
+        self.media = np.asarray(arrays['media'], dtype=np.float64)
+        self.escala = np.asarray(arrays['escala'], dtype=np.float64)
+        self.caracteristica = arrays['caracteristica']
+        self.umbral = arrays['umbral']
+        self.izquierdo = arrays['izquierdo']
+        self.derecho = arrays['derecho']
+        self.default_left = arrays['default_left']
+        self.raices = arrays['raices']
+        self.profundidad_max = int(arrays['profundidad_max'])
+        self.base_margin = np.float32(arrays['base_margin'])
+        self.classes_ = np.array([0, 1])
+        self._tabular()
+
+    @property
+    def n_arboles(self):
+        return len(self.raices)
+
+    def _recorrer(self, Xs, raiz):
+        """Recorre un árbol nodo a nodo para las filas Xs (float32) y retorna el valor de la hoja."""
+        nodos = np.full(len(Xs), raiz, dtype=np.intp)
+        filas = np.arange(len(Xs))
+        for _ in range(self.profundidad_max):
+            valores = Xs[filas, self.caracteristica[nodos]]
+            ir_izquierda = np.where(np.isnan(valores),
+                                    self.default_left[nodos],
+                                    valores < self.umbral[nodos])
+            nodos = np.where(ir_izquierda, self.izquierdo[nodos], self.derecho[nodos])
+        return self.umbral[nodos]
+
+    def _tabular(self):
+        """
+        Construye, para cada árbol, la tabla de hojas sobre su rejilla de umbrales
+        y los mapas de índice global de tramo -> desplazamiento en la tabla.
+        El tramo len(cortes)+1 de cada característica se reserva para NaN.
+        """
+        n_nodos = len(self.umbral)
+        es_hoja = self.izquierdo == np.arange(n_nodos)
+        finales = np.append(self.raices[1:], n_nodos)
+        n_caracteristicas = len(self.media)
+
+        # Umbrales globales por característica; tramo g = cuántos cortes son <= x
+        self.cortes = [np.unique(self.umbral[~es_hoja & (self.caracteristica == f)])
+                       for f in range(n_caracteristicas)]
+        n_tramos = [len(c) + 2 for c in self.cortes]
+
+        self.mapas = [np.zeros((self.n_arboles, n), dtype=np.int32) for n in n_tramos]
+        tablas = []
+        desplazamiento = 0
+
+        for t, (raiz, fin) in enumerate(zip(self.raices, finales)):
+            nodos = slice(raiz, fin)
+            representantes = []
+            pasos = []
+            for f in range(n_caracteristicas):
+                usados = ~es_hoja[nodos] & (self.caracteristica[nodos] == f)
+                propios = np.unique(self.umbral[nodos][usados])
+                if len(propios) == 0:
+                    representantes.append(np.zeros(1, dtype=np.float32))
+                    pasos.append(np.zeros(n_tramos[f], dtype=np.int32))
+                    continue
+                # Celda local: 0 -> (-inf, k0), i -> [k(i-1), k(i)), m+1 -> NaN
+                representantes.append(np.concatenate([[-np.inf], propios, [np.nan]]).astype(np.float32))
+                locales = np.searchsorted(propios, self.cortes[f], side='right')
+                pasos.append(np.concatenate([[0], locales, [len(propios) + 1]]).astype(np.int32))
+
+            rejilla = np.meshgrid(*representantes, indexing='ij')
+            puntos = np.column_stack([r.ravel() for r in rejilla])
+            tablas.append(self._recorrer(puntos, raiz))
+
+            zancada = 1
+            for f in reversed(range(n_caracteristicas)):
+                self.mapas[f][t] = pasos[f] * zancada
+                zancada *= len(representantes[f])
+            self.mapas[0][t] += desplazamiento
+            desplazamiento += len(puntos)
+
+        self.tabla = np.concatenate(tablas).astype(np.float32)
+
+    def _tramos(self, Xs):
+        """Índice global de tramo por característica (n, ) para cada columna de Xs."""
+        tramos = []
+        for f, cortes in enumerate(self.cortes):
+            columna = Xs[:, f]
+            g = np.searchsorted(cortes, columna, side='right')
+            g[np.isnan(columna)] = len(cortes) + 1
+            tramos.append(g)
+        return tramos
+
+    def decision_function(self, X):
+        """Margen (log-odds) en float32 para cada fila de X (n, 3)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        # El scaler trabaja en float64; XGBoost recibe los datos en float32
+        Xs = ((X - self.media) / self.escala).astype(np.float32)
+        tramos = self._tramos(Xs)
+
+        margen = np.empty(len(Xs), dtype=np.float32)
+        for inicio in range(0, len(Xs), self.TAM_BLOQUE):
+            bloque = slice(inicio, inicio + self.TAM_BLOQUE)
+            indices = self.mapas[0][:, tramos[0][bloque]]
+            for f in range(1, len(tramos)):
+                indices += self.mapas[f][:, tramos[f][bloque]]
+            hojas = self.tabla[indices]
+            # Suma árbol a árbol en float32 partiendo del margen base, como XGBoost
+            hojas[0] += self.base_margin
+            margen[bloque] = hojas.sum(axis=0, dtype=np.float32)
+        return margen
+
+    def predict_proba(self, X):
+        margen = self.decision_function(X)
+        p = (np.float32(1.0) / (np.float32(1.0) + np.exp(-margen))).astype(np.float32)
+        return np.column_stack([np.float32(1.0) - p, p])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > UMBRAL_ESTRES).astype(int)
+
+
+def exportar_modelo(pipeline, ruta='best_wesad_xgboost_compilado.npz'):
+    """
+    Aplana scaler + árboles del pipeline y los guarda en un .npz.
+    Parámetros:
+    - pipeline: Pipeline (scaler + smote + XGBClassifier) cargado con load_model
+    - ruta: Archivo destino
+
+    Retorna:
+    - ModeloCompilado equivalente al pipeline
+    """
+    scaler = pipeline.named_steps['scaler']
+    nombres = list(getattr(scaler, 'feature_names_in_', FEATURES))
+    if nombres != FEATURES:
+        raise ValueError(f"El scaler espera {nombres}, se esperaba {FEATURES}")
+
+    arrays = _arrays_desde_booster(pipeline.named_steps['classifier'].get_booster())
+    arrays['media'] = scaler.mean_
+    arrays['escala'] = scaler.scale_
+
+    np.savez(ruta, **arrays)
+    print(f"Modelo compilado guardado en {ruta} "
+          f"({len(arrays['raices'])} árboles, {len(arrays['umbral'])} nodos)")
+    return ModeloCompilado(arrays)
+
+
+def _leer_npz(ruta):
+    with np.load(ruta) as datos:
+        arrays = {k: datos[k] for k in datos.files}
+    return ModeloCompilado(arrays)
+
+
+def cargar_modelo_compilado(ruta='best_wesad_xgboost_compilado.npz'):
+    """Carga un modelo exportado con exportar_modelo (una vez por proceso, vía registro_modelos)."""
+    return obtener_modelo(ruta, cargador=_leer_npz)
+
+
+def verificar_paridad(pipeline, modelo, X, tolerancia=1e-6):
+    """
+    Compara el modelo compilado con el pipeline original sobre X (n, 3).
+    Retorna True si las probabilidades difieren menos que la tolerancia y las
+    etiquetas coinciden (salvo filas a menos de la tolerancia del umbral).
+    """
+    import pandas as pd
+
+    X_df = pd.DataFrame(np.asarray(X, dtype=np.float64), columns=FEATURES)
+    proba_ref = pipeline.predict_proba(X_df)[:, 1]
+    proba = modelo.predict_proba(X_df.to_numpy())[:, 1]
+
+    diferencia = np.abs(proba_ref.astype(np.float64) - proba)
+    en_frontera = np.abs(proba_ref - UMBRAL_ESTRES) <= tolerancia
+    etiquetas_ok = (proba_ref > UMBRAL_ESTRES) == (proba > UMBRAL_ESTRES)
+
+    print(f"Paridad sobre {len(X_df)} filas: dif. máxima de probabilidad = {diferencia.max():.2e}, "
+          f"etiquetas distintas = {int((~etiquetas_ok & ~en_frontera).sum())}")
+    return bool(diferencia.max() <= tolerancia and (etiquetas_ok | en_frontera).all())
+
+
+def _muestra_wesad(n=20000, semilla=42):
+    """
+    Lecturas de prueba dentro de los rangos de muñeca de WESAD
+    (los mismos que usa simu_reloj para los sliders).
+    """
+    rng = np.random.default_rng(semilla)
+    return np.column_stack([
+        rng.uniform(-20.0, 20.0, n),   # bvp
+        rng.uniform(0.2, 5.0, n),      # eda
+        rng.uniform(31.0, 34.0, n),    # temp
+    ])
+
+
+if __name__ == "__main__":
+    import sys
+    from stress_model import load_model
+
+    pipeline = load_model()
+    modelo = exportar_modelo(pipeline)
+
+    # Opcional: CSV con columnas bvp, eda, temp (p. ej. ventanas de un sujeto reservado)
+    if len(sys.argv) > 1:
+        import pandas as pd
+        X = pd.read_csv(sys.argv[1])[FEATURES].to_numpy()
+    else:
+        X = _muestra_wesad()
+
+    ok = verificar_paridad(pipeline, modelo, X)
+    print("✅ Paridad verificada" if ok else "❌ El modelo compilado no coincide con el pipeline")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,325 @@
+"""
+Benchmarks del modelo de estrés y del camino de alertas
+- carga_modelo: deserializar el .pkl (carga en frío, sin el registro del proceso)
+- latencia_individual: predict_stress y PredictorEstres, una lectura por llamada
+- rendimiento_lote: predict_stress_batch (y el modelo compilado) con varios tamaños de lote
+- extremo_a_extremo: lectura -> predicción -> EmisorAlertas -> receptor_datos
+  (receptor real en un hilo, sin abrir el chatbot)
+
+Los resultados se escriben en JSON y se comparan con una base guardada: si alguna
+métrica empeora más que el umbral (el doble para los p99 y, si es una latencia, además
+más de TOLERANCIA_MS), el proceso termina con código 1; si no hay base, con código 2.
+
+Uso:
+    python benchmark_modelo.py [--salida resultados.json] [--base benchmark_base.json]
+                               [--umbral 0.25] [--guardar-base] [--rapido]
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+from registro_modelos import RegistroModelos
+from stress_model import (FEATURES, PredictorEstres, load_model, predict_stress,
+                          predict_stress_batch)
+
+RUTA_MODELO = 'best_wesad_xgboost_con_smote_model_v2.pkl'
+RUTA_BASE = 'benchmark_base.json'
+UMBRAL_REGRESION = 0.25
+# Una latencia solo cuenta como regresión si además empeora más que esto (ms):
+# en tiempos de pocos ms el 25% está dentro del ruido de una ejecución corta
+TOLERANCIA_MS = 1.0
+# Los p99 usan este múltiplo del umbral: con pocas muestras son casi el máximo
+FACTOR_UMBRAL_P99 = 2.0
+TAMANOS_LOTE = [1, 16, 64, 256, 1024, 4096]
+
+# Lectura que el modelo clasifica como estrés (rango de estrés de sesiones.generar_sintetica)
+LECTURA_ESTRES = {'bvp': 0.6, 'eda': 3.0, 'temp': 33.0}
+
+
+def _metrica(valor, unidad, mejor='menor'):
+    return {'valor': float(valor), 'unidad': unidad, 'mejor': mejor}
+
+
+def _percentiles(muestras_ms, prefijo):
+    return {
+        f'{prefijo}_p50_ms': _metrica(np.percentile(muestras_ms, 50), 'ms'),
+        f'{prefijo}_p99_ms': _metrica(np.percentile(muestras_ms, 99), 'ms'),
+    }
+
+
+def _lecturas(n, semilla=42):
+    """Lecturas dentro de los rangos de muñeca de WESAD, columnas [bvp, eda, temp]."""
+    rng = np.random.default_rng(semilla)
+    return np.column_stack([rng.normal(0, 25, n), rng.uniform(0.1, 4.0, n), rng.uniform(30, 35, n)])
+
+
+def bench_carga_modelo(repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        registro = RegistroModelos()   # registro nuevo: siempre carga en frío
+        inicio = time.perf_counter()
+        registro.obtener(RUTA_MODELO)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {'carga_mediana_ms': _metrica(np.median(tiempos), 'ms')}
+
+
+def bench_latencia_individual(pipeline, n=300):
+    X = _lecturas(n)
+    resultados = {}
+
+    tiempos = []
+    with contextlib.redirect_stdout(io.StringIO()):   # predict_stress imprime cada resultado
+        for bvp, eda, temp in X:
+            inicio = time.perf_counter()
+            predict_stress(bvp, temp, eda, pipeline)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    resultados.update(_percentiles(tiempos, 'predict_stress'))
+
+    predictor = PredictorEstres(pipeline)
+    tiempos = []
+    for bvp, eda, temp in X:
+        inicio = time.perf_counter()
+        predictor.predecir(bvp, temp, eda)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    resultados.update(_percentiles(tiempos, 'predictor'))
+    return resultados
+
+
+def _filas_por_segundo(funcion, X, minimo_segundos=0.5, tramos=3):
+    """Mejor rendimiento de 'tramos' mediciones que suman minimo_segundos (menos ruido)."""
+    funcion(X)   # calentamiento
+    mejor = 0.0
+    for _ in range(tramos):
+        llamadas = 0
+        inicio = time.perf_counter()
+        while True:
+            funcion(X)
+            llamadas += 1
+            transcurrido = time.perf_counter() - inicio
+            if transcurrido >= minimo_segundos / tramos:
+                break
+        mejor = max(mejor, llamadas * len(X) / transcurrido)
+    return mejor
+
+
+def bench_rendimiento_lote(pipeline, tamanos=TAMANOS_LOTE, minimo_segundos=0.5):
+    from arbol_compilado import ModeloCompilado, _arrays_desde_booster
+
+    arrays = _arrays_desde_booster(pipeline.named_steps['classifier'].get_booster())
+    arrays['media'] = pipeline.named_steps['scaler'].mean_
+    arrays['escala'] = pipeline.named_steps['scaler'].scale_
+    compilado = ModeloCompilado(arrays)
+
+    resultados = {}
+    for n in tamanos:
+        X = _lecturas(n)
+        resultados[f'pipeline_lote_{n}_filas_s'] = _metrica(
+            _filas_por_segundo(lambda X: predict_stress_batch(X, pipeline), X, minimo_segundos),
+            'filas/s', 'mayor')
+        resultados[f'compilado_lote_{n}_filas_s'] = _metrica(
+            _filas_por_segundo(compilado.predict_proba, X, minimo_segundos), 'filas/s', 'mayor')
+    return resultados
+
+
+class _RelojLlegadas:
+    """
+    al_procesar del receptor: anota, con time.perf_counter(), la latencia de cada
+    lectura desde que se tomó hasta que el receptor terminó de procesarla (motor incluido).
+    """
+
+    def __init__(self):
+        self.tomadas = {}          # seq -> perf_counter() al tomar la lectura
+        self.latencias_ms = []
+        self.completo = threading.Event()
+        self.esperadas = 0
+
+    def tomar(self, seq):
+        self.tomadas[seq] = time.perf_counter()
+
+    def procesada(self, mensaje):
+        ahora = time.perf_counter()
+        secuencias = mensaje['seq'].tolist() if isinstance(mensaje, np.ndarray) else [mensaje['seq']]
+        for seq in secuencias:
+            tomada = self.tomadas.pop(seq, None)
+            if tomada is not None:
+                self.latencias_ms.append((ahora - tomada) * 1000)
+        if len(self.latencias_ms) >= self.esperadas:
+            self.completo.set()
+
+    def ronda(self, esperadas):
+        self.latencias_ms = []
+        self.esperadas = esperadas
+        self.completo.clear()
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def bench_extremo_a_extremo(pipeline, n=200, intervalo=0.005, repeticiones=3):
+    """
+    Desde que se toma la lectura hasta que receptor_datos la procesa.
+    Se repite 'repeticiones' veces con el mismo receptor y se reporta la mediana de
+    cada percentil, para que el p99 de una ronda ruidosa no decida la comparación.
+    """
+    import receptor_datos
+    from motor_alertas import MotorAlertas
+    from protocolo_alertas import FORMATO_BINARIO, EmisorAlertas
+
+    reloj = _RelojLlegadas()
+    puerto = _puerto_libre()
+    # Nunca alcanza el umbral: el benchmark no abre el chatbot
+    motor = MotorAlertas(alertas_para_activar=n * repeticiones + 1)
+
+    bucle = asyncio.new_event_loop()
+    hilo = threading.Thread(target=bucle.run_forever, daemon=True)
+    rondas = []
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        hilo.start()
+        receptor = asyncio.run_coroutine_threadsafe(
+            receptor_datos.main(receptor_datos.HOST, puerto, motor, al_procesar=reloj.procesada), bucle)
+        time.sleep(0.3)
+        predictor = PredictorEstres(pipeline)
+        if predictor.predecir(LECTURA_ESTRES['bvp'], LECTURA_ESTRES['temp'], LECTURA_ESTRES['eda']).prediccion != 1:
+            raise RuntimeError(f"El modelo no clasifica {LECTURA_ESTRES} como estrés")
+        emisor = EmisorAlertas(receptor_datos.HOST, puerto, formato=FORMATO_BINARIO)
+        try:
+            for r in range(repeticiones):
+                reloj.ronda(n)
+                for i in range(n):
+                    seq = r * n + i
+                    reloj.tomar(seq)
+                    lectura = dict(LECTURA_ESTRES, bvp=LECTURA_ESTRES['bvp'] + i * 1e-6, ts=time.time(), seq=seq)
+                    if predictor.predecir(lectura['bvp'], lectura['temp'], lectura['eda']).prediccion == 1:
+                        emisor.enviar(lectura)
+                    time.sleep(intervalo)
+                reloj.completo.wait(5)
+                if reloj.latencias_ms:
+                    rondas.append(reloj.latencias_ms)
+        finally:
+            emisor.cerrar()
+            # Cerrar el servidor y esperar a que terminen sus tareas antes de parar el loop
+            receptor.cancel()
+            asyncio.run_coroutine_threadsafe(_esperar_tareas(), bucle).result(5)
+            bucle.call_soon_threadsafe(bucle.stop)
+            hilo.join(2)
+            bucle.close()
+
+    if not rondas:
+        raise RuntimeError("El receptor no recibió ninguna alerta")
+    resultados = {
+        f'alerta_p{p}_ms': _metrica(np.median([np.percentile(ronda, p) for ronda in rondas]), 'ms')
+        for p in (50, 99)
+    }
+    resultados['alertas_recibidas'] = _metrica(np.median([len(ronda) for ronda in rondas]), 'alertas', 'mayor')
+    return resultados
+
+
+async def _esperar_tareas():
+    """Espera a las demás tareas del loop (receptor cancelado, conexiones cerrándose)."""
+    actual = asyncio.current_task()
+    await asyncio.gather(*(t for t in asyncio.all_tasks() if t is not actual), return_exceptions=True)
+
+
+def ejecutar(rapido=False):
+    """Ejecuta todos los benchmarks; retorna el diccionario de resultados."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        pipeline = load_model(RUTA_MODELO)
+    segundos = 0.2 if rapido else 0.5
+    resultados = {
+        'carga_modelo': bench_carga_modelo(3 if rapido else 5),
+        'latencia_individual': bench_latencia_individual(pipeline, 100 if rapido else 300),
+        'rendimiento_lote': bench_rendimiento_lote(pipeline, minimo_segundos=segundos),
+        'extremo_a_extremo': bench_extremo_a_extremo(pipeline, 50 if rapido else 200),
+    }
+    import sklearn
+    import xgboost
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'entorno': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'xgboost': xgboost.__version__,
+            'cpus': os.cpu_count(),
+        },
+        'features': FEATURES,
+        'resultados': resultados,
+    }
+
+
+def comparar(actual, base, umbral=UMBRAL_REGRESION, tolerancia_ms=TOLERANCIA_MS):
+    """
+    Lista de regresiones (texto) de 'actual' respecto a 'base' por encima del umbral.
+    Los p99 usan FACTOR_UMBRAL_P99 * umbral; en las métricas en ms la diferencia
+    también debe superar tolerancia_ms.
+    """
+    regresiones = []
+    for grupo, metricas in actual['resultados'].items():
+        for nombre, metrica in metricas.items():
+            anterior = base.get('resultados', {}).get(grupo, {}).get(nombre)
+            if not anterior or anterior['valor'] == 0:
+                continue
+            cambio = metrica['valor'] / anterior['valor'] - 1
+            limite = umbral * FACTOR_UMBRAL_P99 if '_p99' in nombre else umbral
+            peor = cambio > limite if metrica['mejor'] == 'menor' else cambio < -limite
+            if metrica['unidad'] == 'ms' and abs(metrica['valor'] - anterior['valor']) <= tolerancia_ms:
+                peor = False
+            if peor:
+                regresiones.append(f"{grupo}.{nombre}: {anterior['valor']:.4g} -> "
+                                   f"{metrica['valor']:.4g} {metrica['unidad']} ({cambio:+.0%})")
+    return regresiones
+
+
+if __name__ == "__main__":
+    def argumento(nombre, defecto):
+        if nombre in sys.argv:
+            return sys.argv[sys.argv.index(nombre) + 1]
+        return defecto
+
+    print("⏱️  Ejecutando benchmarks...")
+    actual = ejecutar(rapido='--rapido' in sys.argv)
+    for grupo, metricas in actual['resultados'].items():
+        print(f"\n{grupo}")
+        for nombre, metrica in metricas.items():
+            print(f"   {nombre:32} {metrica['valor']:>14.4g} {metrica['unidad']}")
+
+    salida = argumento('--salida', 'benchmark_resultados.json')
+    with open(salida, 'w') as f:
+        json.dump(actual, f, indent=2)
+    print(f"\nResultados guardados en {salida}")
+
+    ruta_base = argumento('--base', RUTA_BASE)
+    if '--guardar-base' in sys.argv:
+        with open(ruta_base, 'w') as f:
+            json.dump(actual, f, indent=2)
+        print(f"Base guardada en {ruta_base}")
+        sys.exit(0)
+
+    if not os.path.exists(ruta_base):
+        print(f"\n❌ Sin base en {ruta_base}: ejecute con --guardar-base para crearla")
+        sys.exit(2)
+
+    with open(ruta_base) as f:
+        base = json.load(f)
+    umbral = float(argumento('--umbral', UMBRAL_REGRESION))
+    regresiones = comparar(actual, base, umbral)
+    if regresiones:
+        print(f"\n❌ Regresiones por encima del {umbral:.0%}:")
+        for r in regresiones:
+            print(f"   {r}")
+        sys.exit(1)
+    print(f"\n✅ Sin regresiones respecto a {ruta_base} (umbral {umbral:.0%})")
@@ -0,0 +1,132 @@
+"""
+Calibración por usuario antes del modelo
+La EDA y la temperatura de la piel tienen líneas base muy distintas entre personas,
+pero el pipeline las compara contra el scaler de la población de WESAD.
+Cada usuario lleva una línea base móvil (media y varianza con decaimiento
+exponencial) por canal; la lectura se expresa respecto a esa línea base y se
+lleva a la escala de la población antes de pasarla al pipeline:
+
+    x_calibrada = media_poblacion + (x - media_usuario) / desv_usuario * desv_poblacion
+
+- actualizar(): O(1) por lectura (tres canales, aritmética de floats)
+- Mientras hay pocas lecturas se mezcla con el valor sin calibrar
+- Persistencia compacta: un archivo de 60 bytes por usuario
+"""
+
+import hashlib
+import math
+import os
+import re
+import struct
+
+from stress_model import FEATURES
+
+# Peso de cada lectura nueva: ~1/alfa lecturas de memoria (a 4 Hz, 1/7200 ≈ 30 min)
+ALFA = 1 / 7200
+# Lecturas hasta aplicar la calibración completa
+LECTURAS_MINIMAS = 240
+
+# n (uint32) | alfa | medias (3) | varianzas (3)
+_FORMATO = struct.Struct('<Id3d3d')
+
+
+class CalibracionUsuario:
+    """Línea base de un usuario: media y varianza con decaimiento exponencial por canal."""
+
+    __slots__ = ('alfa', 'minimo', 'n', 'media', 'varianza')
+
+    def __init__(self, alfa=ALFA, minimo=LECTURAS_MINIMAS, n=0, media=None, varianza=None):
+        self.alfa = alfa
+        self.minimo = minimo
+        self.n = n
+        self.media = list(media) if media is not None else [0.0] * len(FEATURES)
+        self.varianza = list(varianza) if varianza is not None else [0.0] * len(FEATURES)
+
+    def actualizar(self, valores):
+        """Incorpora una lectura [bvp, eda, temp]."""
+        self.n += 1
+        # Al principio media acumulada (1/n); después, decaimiento exponencial (alfa)
+        alfa = max(self.alfa, 1.0 / self.n)
+        media = self.media
+        varianza = self.varianza
+        for i, x in enumerate(valores):
+            diferencia = x - media[i]
+            incremento = alfa * diferencia
+            media[i] += incremento
+            varianza[i] = (1.0 - alfa) * (varianza[i] + diferencia * incremento)
+
+    def calibrar(self, valores, medias_poblacion, desv_poblacion):
+        """Lleva una lectura [bvp, eda, temp] a la escala de la población."""
+        peso = min(1.0, self.n / self.minimo) if self.minimo else 1.0
+        if peso == 0.0:
+            return list(valores)
+        resultado = []
+        for i, x in enumerate(valores):
+            varianza = self.varianza[i]
+            if varianza <= 1e-12:   # canal constante: no hay escala del usuario
+                resultado.append(x)
+                continue
+            z = (x - self.media[i]) / math.sqrt(varianza)
+            resultado.append((1.0 - peso) * x + peso * (medias_poblacion[i] + z * desv_poblacion[i]))
+        return resultado
+
+    def a_bytes(self):
+        return _FORMATO.pack(self.n, self.alfa, *self.media, *self.varianza)
+
+    @classmethod
+    def desde_bytes(cls, datos, minimo=LECTURAS_MINIMAS):
+        n, alfa, *resto = _FORMATO.unpack(datos)
+        canales = len(FEATURES)
+        return cls(alfa, minimo, n, resto[:canales], resto[canales:])
+
+
+def referencia_poblacion(pipeline):
+    """Medias y desviaciones de la población (scaler del pipeline), en el orden de FEATURES."""
+    scaler = pipeline.named_steps['scaler']
+    return [float(v) for v in scaler.mean_], [float(v) for v in scaler.scale_]
+
+
+class AlmacenCalibraciones:
+    """
+    Calibraciones de todos los usuarios, una en memoria por usuario y un archivo
+    <directorio>/<usuario>_<hash>.cal por usuario en disco (se carga al primer uso).
+    El hash corto del identificador original evita que dos usuarios cuyo nombre
+    saneado coincide ("a/b" y "a_b") compartan archivo.
+    Solo lo usa servidor_inferencia (--calibrar); receptor_datos y simu_reloj
+    pasan las lecturas al modelo sin calibrar.
+    """
+
+    def __init__(self, directorio='calibraciones', alfa=ALFA, minimo=LECTURAS_MINIMAS):
+        self.directorio = directorio
+        self.alfa = alfa
+        self.minimo = minimo
+        self._usuarios = {}
+
+    def _ruta(self, usuario):
+        nombre = re.sub(r'[^A-Za-z0-9_.-]', '_', str(usuario))
+        resumen = hashlib.sha1(str(usuario).encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.directorio, f"{nombre}_{resumen}.cal")
+
+    def obtener(self, usuario):
+        """Calibración del usuario (la lee de disco o crea una vacía)."""
+        calibracion = self._usuarios.get(usuario)
+        if calibracion is None:
+            ruta = self._ruta(usuario)
+            if os.path.exists(ruta):
+                with open(ruta, 'rb') as f:
+                    calibracion = CalibracionUsuario.desde_bytes(f.read(), self.minimo)
+            else:
+                calibracion = CalibracionUsuario(self.alfa, self.minimo)
+            self._usuarios[usuario] = calibracion
+        return calibracion
+
+    def guardar(self, usuario=None):
+        """Escribe la calibración de un usuario (o de todos los cargados)."""
+        os.makedirs(self.directorio, exist_ok=True)
+        usuarios = [usuario] if usuario is not None else list(self._usuarios)
+        for u in usuarios:
+            ruta = self._ruta(u)
+            with open(ruta + '.tmp', 'wb') as f:
+                f.write(self._usuarios[u].a_bytes())
+            os.replace(ruta + '.tmp', ruta)
+        return len(usuarios)
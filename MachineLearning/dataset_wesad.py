@@ -0,0 +1,259 @@
+"""
+Construcción de la tabla de entrenamiento WESAD fuera del notebook
+- Carga los sujetos en paralelo (un proceso por sujeto)
+- Guarda el resultado ventaneado de cada sujeto como shard en cache_wesad/:
+  <sujeto>_<clave>.X.npy (float32, una columna por señal) y <sujeto>_<clave>.y.npy (int8),
+  donde la clave depende de la configuración y del archivo fuente
+- Los shards se abren con np.load(mmap_mode='r'): el entrenamiento lee de disco
+  sin tener la tabla completa en memoria (ver entrenamiento_wesad.py)
+- En ejecuciones siguientes solo procesa los sujetos que no están en cache
+- Las señales de muñeca se promedian por ventana a su frecuencia nativa y las
+  etiquetas (700 Hz) se reducen por ventana: nunca se construye la tabla a 700 Hz
+
+Uso:
+    python dataset_wesad.py [--datos <carpeta WESAD>] [--procesos N] [--salida tabla.pkl]
+Si no se indica --datos, los .pkl se descargan con kagglehub como en el notebook.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+from ventanas_streaming import FRECUENCIAS_E4
+
+# Misma configuración de datos que WESAD_ML.ipynb
+CONFIG_DATASET = {
+    'subjects': ["S2", "S3", "S4", "S5", "S6", "S7", "S8", "S9",
+                 "S10", "S11", "S13", "S14", "S15", "S16", "S17"],
+    'sampling_rate_hz': 700,
+    'window_seconds': 1,
+}
+
+# Cambiar al modificar el procesamiento para invalidar la cache existente
+VERSION_PROCESAMIENTO = 3
+
+# Frecuencias nativas de la muñeca (Empatica E4) en Hz
+FRECUENCIAS_MUNECA = dict(FRECUENCIAS_E4, acc=32)
+
+SENALES = ['acc_x', 'acc_y', 'acc_z', 'bvp', 'eda', 'temp']
+COLUMNAS = SENALES + ['stress']
+DIR_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_wesad')
+
+
+def ruta_sujeto(subject, ruta_wesad=None):
+    """Ruta del .pkl de un sujeto: carpeta local o descarga con kagglehub."""
+    if ruta_wesad:
+        return os.path.join(ruta_wesad, subject, f"{subject}.pkl")
+    import kagglehub
+    return kagglehub.dataset_download(
+        "orvile/wesad-wearable-stress-affect-detection-dataset",
+        f"WESAD/{subject}/{subject}.pkl"
+    )
+
+
+def clave_cache(subject, ruta, config):
+    """Clave de cache: configuración + versión + firma (tamaño, mtime) del archivo fuente."""
+    info = os.stat(ruta)
+    contenido = {
+        'subject': subject,
+        'hz': config['sampling_rate_hz'],
+        'window_seconds': config['window_seconds'],
+        'version': VERSION_PROCESAMIENTO,
+        'fuente': [info.st_size, info.st_mtime_ns],
+    }
+    return hashlib.sha1(json.dumps(contenido, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _por_ventana(senal, frecuencia, window_seconds, n_ventanas, reduccion=np.mean):
+    """
+    Reduce una señal (n,) o (n, c) a un valor por ventana sin remuestrear a 700 Hz.
+    - Si cada ventana tiene un número entero de muestras: bloques de muestras nativas
+    - Si no: remuestreo polifásico directo a la frecuencia de ventanas
+    Si la señal se queda corta respecto a las etiquetas se repite la última muestra.
+    """
+    senal = np.asarray(senal)
+    por_ventana = Fraction(frecuencia) * Fraction(window_seconds).limit_denominator(1000)
+    if por_ventana.denominator == 1:
+        paso = int(por_ventana)
+        necesarias = n_ventanas * paso
+        if len(senal) < necesarias:
+            relleno = np.repeat(senal[-1:], necesarias - len(senal), axis=0)
+            senal = np.concatenate([senal, relleno])
+        bloques = senal[:necesarias].reshape((n_ventanas, paso) + senal.shape[1:])
+        return reduccion(bloques, axis=1)
+
+    from scipy.signal import resample_poly
+    razon = 1 / por_ventana
+    remuestreada = resample_poly(senal.astype(np.float64), razon.numerator, razon.denominator,
+                                 axis=0, padtype='line')
+    if len(remuestreada) < n_ventanas:
+        relleno = np.repeat(remuestreada[-1:], n_ventanas - len(remuestreada), axis=0)
+        remuestreada = np.concatenate([remuestreada, relleno])
+    return remuestreada[:n_ventanas]
+
+
+def procesar_sujeto(subject, ruta, config):
+    """
+    Carga un sujeto y devuelve sus ventanas como diccionario de columnas NumPy.
+    Misma tabla que load_subject + window_reduce del notebook (media de cada
+    señal y máximo de la etiqueta de estrés por ventana), pero alineando las
+    etiquetas a las ventanas en lugar de subir las señales a 700 Hz.
+    """
+    with open(ruta, "rb") as f:
+        data = pickle.load(f, encoding="latin1")
+
+    wrist = data["signal"]["wrist"]
+    labels = np.asarray(data["label"])
+    hz = config['sampling_rate_hz']
+    w = config['window_seconds']
+    n_ventanas = len(labels) // int(hz * w)
+
+    acc = _por_ventana(wrist["ACC"], FRECUENCIAS_MUNECA['acc'], w, n_ventanas)
+    # Etiqueta binaria: 0=no estrés, 1=estrés (máximo dentro de la ventana)
+    stress = _por_ventana(labels == 2, hz, w, n_ventanas, reduccion=np.max)
+    return {
+        'acc_x': acc[:, 0],
+        'acc_y': acc[:, 1],
+        'acc_z': acc[:, 2],
+        'bvp': _por_ventana(np.ravel(wrist["BVP"]), FRECUENCIAS_MUNECA['bvp'], w, n_ventanas),
+        'eda': _por_ventana(np.ravel(wrist["EDA"]), FRECUENCIAS_MUNECA['eda'], w, n_ventanas),
+        'temp': _por_ventana(np.ravel(wrist["TEMP"]), FRECUENCIAS_MUNECA['temp'], w, n_ventanas),
+        'stress': stress.astype(np.int64),
+    }
+
+
+class ShardSujeto:
+    """Ventanas de un sujeto en disco: X (n, len(SENALES)) float32 e y (n,) int8, en memmap."""
+
+    def __init__(self, subject, ruta_base):
+        self.subject = subject
+        self.ruta_base = ruta_base
+        self.X = np.load(ruta_base + '.X.npy', mmap_mode='r')
+        self.y = np.load(ruta_base + '.y.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.y)
+
+    def columnas(self, nombres):
+        """Índices de las señales pedidas dentro de X."""
+        return [SENALES.index(n) for n in nombres]
+
+
+def _guardar_npy(ruta, arreglo):
+    """np.save atómico: archivo temporal + os.replace."""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        np.save(f, arreglo)
+    os.replace(temporal, ruta)
+
+
+def _trabajo_sujeto(subject, ruta, config, ruta_base):
+    """Tarea de un proceso del pool: procesa el sujeto y escribe su shard."""
+    inicio = time.perf_counter()
+    columnas = procesar_sujeto(subject, ruta, config)
+    X = np.empty((len(columnas['stress']), len(SENALES)), dtype=np.float32)
+    for i, nombre in enumerate(SENALES):
+        X[:, i] = columnas[nombre]
+    # y se escribe al final: su presencia indica que el shard está completo
+    _guardar_npy(ruta_base + '.X.npy', X)
+    _guardar_npy(ruta_base + '.y.npy', columnas['stress'].astype(np.int8))
+    return subject, time.perf_counter() - inicio
+
+
+def construir_shards(subjects=None, ruta_wesad=None, config=None,
+                     procesos=None, dir_cache=DIR_CACHE):
+    """
+    Asegura que cada sujeto tenga su shard en cache (procesando en paralelo los que falten).
+
+    Parámetros:
+    - subjects: Lista de sujetos (por defecto CONFIG_DATASET['subjects'])
+    - ruta_wesad: Carpeta local con WESAD/<S>/<S>.pkl (None = kagglehub)
+    - config: Diccionario con sampling_rate_hz y window_seconds
+    - procesos: Número de procesos (None = núcleos disponibles)
+    - dir_cache: Carpeta de la cache por sujeto
+
+    Retorna:
+    - Lista de ShardSujeto, en el orden de subjects
+    """
+    config = dict(CONFIG_DATASET, **(config or {}))
+    subjects = subjects or config['subjects']
+    os.makedirs(dir_cache, exist_ok=True)
+
+    bases = {}
+    pendientes = []
+    for subject in subjects:
+        try:
+            ruta = ruta_sujeto(subject, ruta_wesad)
+            base = os.path.join(dir_cache, f"{subject}_{clave_cache(subject, ruta, config)}")
+        except Exception as e:
+            print(f"Error en {subject}: {e}")
+            continue
+        bases[subject] = base
+        if not os.path.exists(base + '.y.npy'):
+            pendientes.append((subject, ruta, base))
+
+    print(f"\nSujetos: {len(bases)} | en cache: {len(bases) - len(pendientes)} | "
+          f"a procesar: {len(pendientes)}")
+
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = {pool.submit(_trabajo_sujeto, s, r, config, b): s for s, r, b in pendientes}
+            for futuro, subject in futuros.items():
+                try:
+                    _, segundos = futuro.result()
+                    print(f"Procesado {subject} en {segundos:.1f} s")
+                except Exception as e:
+                    print(f"Error en {subject}: {e}")
+                    bases.pop(subject, None)
+
+    if not bases:
+        raise RuntimeError("No se pudo cargar ningún sujeto")
+    return [ShardSujeto(subject, base) for subject, base in bases.items()]
+
+
+def construir_tabla(subjects=None, ruta_wesad=None, config=None,
+                    procesos=None, dir_cache=DIR_CACHE):
+    """
+    Tabla ventaneada de todos los sujetos en memoria (columna 'subject' incluida),
+    para análisis en el notebook. Mismos parámetros que construir_shards.
+
+    Retorna:
+    - DataFrame con una fila por ventana
+    """
+    tablas = []
+    for shard in construir_shards(subjects, ruta_wesad, config, procesos, dir_cache):
+        df = pd.DataFrame(np.asarray(shard.X), columns=SENALES)
+        df['stress'] = np.asarray(shard.y, dtype=np.int64)
+        df.insert(0, 'subject', shard.subject)
+        tablas.append(df)
+    df = pd.concat(tablas, ignore_index=True)
+    print(f"\nDataset ventaneado: {df.shape}")
+    return df
+
+
+if __name__ == "__main__":
+    def argumento(nombre, defecto=None):
+        if nombre in sys.argv:
+            return sys.argv[sys.argv.index(nombre) + 1]
+        return defecto
+
+    procesos = argumento('--procesos')
+    inicio = time.perf_counter()
+    tabla = construir_tabla(
+        ruta_wesad=argumento('--datos'),
+        procesos=int(procesos) if procesos else None,
+    )
+    print(f"Tiempo total: {time.perf_counter() - inicio:.1f} s")
+
+    salida = argumento('--salida')
+    if salida:
+        tabla.to_pickle(salida)
+        print(f"Tabla guardada en {salida}")
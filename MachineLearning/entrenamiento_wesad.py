@@ -0,0 +1,144 @@
+"""
+Entrenamiento del modelo de estrés a partir de los shards de dataset_wesad
+Nunca junta la tabla completa en memoria:
+- El StandardScaler se ajusta por bloques (partial_fit) recorriendo los shards
+- XGBoost recibe los datos con un DataIter: cada bloque se lee del memmap,
+  se escala y se entrega en float32; QuantileDMatrix guarda solo los bins
+
+Como SMOTE necesita todas las muestras en memoria, el desbalance se compensa con
+scale_pos_weight (variante 'Scale Weight' del notebook).
+El resultado es un Pipeline (scaler + XGBClassifier) compatible con stress_model.
+
+Uso:
+    python entrenamiento_wesad.py [--datos <carpeta WESAD>] [--procesos N] [--salida modelo.pkl]
+"""
+
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+from dataset_wesad import construir_shards
+from stress_model import FEATURES
+
+# Filas por bloque al recorrer los shards
+TAM_BLOQUE = 65536
+
+# Hiperparámetros de los modelos XGBoost del notebook (get_models)
+PARAMETROS_XGB = {
+    'n_estimators': 200,
+    'max_depth': 6,
+    'learning_rate': 0.05,
+    'min_child_weight': 1,
+    'gamma': 0.1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'random_state': 42,
+    'eval_metric': 'logloss',
+}
+
+
+def _bloques(shards, features, tam_bloque=TAM_BLOQUE):
+    """Recorre los shards en bloques: (X float32 (m, len(features)), y int8 (m,))."""
+    for shard in shards:
+        columnas = shard.columnas(features)
+        for inicio in range(0, len(shard), tam_bloque):
+            fin = inicio + tam_bloque
+            yield shard.X[inicio:fin, columnas], shard.y[inicio:fin]
+
+
+def ajustar_escalador(shards, features=FEATURES, tam_bloque=TAM_BLOQUE):
+    """StandardScaler ajustado bloque a bloque; retorna (scaler, n_negativos, n_positivos)."""
+    scaler = StandardScaler()
+    positivos = 0
+    total = 0
+    for X, y in _bloques(shards, features, tam_bloque):
+        # DataFrame para que el scaler recuerde los nombres de columnas (predict_stress usa DataFrame)
+        scaler.partial_fit(pd.DataFrame(X.astype(np.float64), columns=features))
+        positivos += int(np.count_nonzero(y))
+        total += len(y)
+    return scaler, total - positivos, positivos
+
+
+class IteradorShards(xgb.DataIter):
+    """Entrega a XGBoost los shards escalados, un bloque cada vez."""
+
+    def __init__(self, shards, features, scaler, tam_bloque=TAM_BLOQUE):
+        self._shards = shards
+        self._features = features
+        self._scaler = scaler
+        self._tam_bloque = tam_bloque
+        self._iterador = None
+        super().__init__()
+
+    def next(self, input_data):
+        if self._iterador is None:
+            self._iterador = _bloques(self._shards, self._features, self._tam_bloque)
+        try:
+            X, y = next(self._iterador)
+        except StopIteration:
+            return False
+        X_escalado = ((X - self._scaler.mean_) / self._scaler.scale_).astype(np.float32)
+        input_data(data=X_escalado, label=np.asarray(y, dtype=np.float32))
+        return True
+
+    def reset(self):
+        self._iterador = None
+
+
+def entrenar(shards, features=FEATURES, parametros=None, tam_bloque=TAM_BLOQUE):
+    """
+    Entrena scaler + XGBoost leyendo los shards por bloques.
+
+    Parámetros:
+    - shards: Lista de ShardSujeto (dataset_wesad.construir_shards)
+    - features: Señales a usar, en el orden del pipeline
+    - parametros: Hiperparámetros XGBoost (por defecto PARAMETROS_XGB)
+    - tam_bloque: Filas por bloque
+
+    Retorna:
+    - pipeline: Pipeline (scaler + XGBClassifier)
+    """
+    parametros = dict(PARAMETROS_XGB, **(parametros or {}))
+    features = list(features)
+
+    scaler, negativos, positivos = ajustar_escalador(shards, features, tam_bloque)
+    if positivos == 0 or negativos == 0:
+        raise ValueError("Los shards no contienen ambas clases")
+    print(f"Ventanas: {negativos + positivos:,} | estrés: {positivos:,} ({positivos / (negativos + positivos):.2%})")
+
+    datos = xgb.QuantileDMatrix(IteradorShards(shards, features, scaler, tam_bloque),
+                                nthread=parametros.get('nthread'))
+    n_arboles = parametros.pop('n_estimators')
+    parametros['seed'] = parametros.pop('random_state')
+    parametros.update(objective='binary:logistic', scale_pos_weight=negativos / positivos)
+    booster = xgb.train(parametros, datos, num_boost_round=n_arboles)
+
+    clasificador = XGBClassifier()
+    clasificador.load_model(bytearray(booster.save_raw('ubj')))
+    return Pipeline([('scaler', scaler), ('classifier', clasificador)])
+
+
+if __name__ == "__main__":
+    def argumento(nombre, defecto=None):
+        if nombre in sys.argv:
+            return sys.argv[sys.argv.index(nombre) + 1]
+        return defecto
+
+    procesos = argumento('--procesos')
+    shards = construir_shards(ruta_wesad=argumento('--datos'),
+                              procesos=int(procesos) if procesos else None)
+
+    inicio = time.perf_counter()
+    pipeline = entrenar(shards)
+    print(f"Entrenamiento: {time.perf_counter() - inicio:.1f} s")
+
+    salida = argumento('--salida', 'wesad_xgboost_shards.pkl')
+    joblib.dump(pipeline, salida)
+    print(f"Pipeline guardado en {salida}")
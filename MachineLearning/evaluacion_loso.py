@@ -0,0 +1,145 @@
+"""
+Evaluación leave-one-subject-out (LOSO) sobre los shards de dataset_wesad
+A diferencia de train_test_split / StratifiedKFold sobre ventanas (notebook), cada
+fold deja fuera a un sujeto completo: el modelo nunca ve ventanas de la persona
+con la que se evalúa.
+- Los folds se ejecutan en paralelo (un proceso por fold) y cada proceso abre los
+  shards por memmap: no se copian datos entre procesos
+- Se reporta el tiempo y las métricas de cada fold, y la media ± desviación
+
+Uso:
+    python evaluacion_loso.py [--datos <carpeta WESAD>] [--procesos N] [--arboles N] [--json salida.json]
+Con --arboles 50 los 15 folds entran en el presupuesto de CI.
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import (accuracy_score, f1_score, precision_score,
+                             recall_score, roc_auc_score)
+
+from dataset_wesad import ShardSujeto, construir_shards
+from entrenamiento_wesad import entrenar
+from stress_model import FEATURES, predict_stress_batch
+
+METRICAS = ('accuracy', 'precision', 'recall', 'f1', 'roc_auc')
+
+
+def _metricas(y, etiquetas, prob_estres):
+    resultado = {
+        'accuracy': accuracy_score(y, etiquetas),
+        'precision': precision_score(y, etiquetas, zero_division=0),
+        'recall': recall_score(y, etiquetas, zero_division=0),
+        'f1': f1_score(y, etiquetas, zero_division=0),
+        # Sin ambas clases en el sujeto la AUC no está definida
+        'roc_auc': roc_auc_score(y, prob_estres) if len(np.unique(y)) == 2 else float('nan'),
+    }
+    return {k: float(v) for k, v in resultado.items()}
+
+
+def _fold(prueba, shards, features, parametros):
+    """
+    Tarea de un proceso: entrena con todos los sujetos salvo 'prueba' y lo evalúa.
+    shards llega como [(subject, ruta_base)] y se reabre aquí por memmap.
+    """
+    inicio = time.perf_counter()
+    abiertos = [ShardSujeto(subject, base) for subject, base in shards]
+    entrenamiento = [s for s in abiertos if s.subject != prueba]
+    evaluado = next(s for s in abiertos if s.subject == prueba)
+
+    pipeline = entrenar(entrenamiento, features, parametros)
+    segundos_entrenamiento = time.perf_counter() - inicio
+
+    X = np.asarray(evaluado.X[:, evaluado.columnas(features)], dtype=np.float64)
+    y = np.asarray(evaluado.y)
+    etiquetas, probabilidades = predict_stress_batch(X, pipeline)
+
+    resultado = _metricas(y, etiquetas, probabilidades[:, 1])
+    resultado.update(
+        subject=prueba,
+        ventanas=len(y),
+        ventanas_estres=int(y.sum()),
+        segundos_entrenamiento=segundos_entrenamiento,
+        segundos=time.perf_counter() - inicio,
+    )
+    return resultado
+
+
+def evaluar_loso(shards, features=FEATURES, parametros=None, procesos=None):
+    """
+    Ejecuta los folds LOSO en paralelo.
+
+    Parámetros:
+    - shards: Lista de ShardSujeto (dataset_wesad.construir_shards)
+    - features: Señales a usar
+    - parametros: Hiperparámetros XGBoost (ver entrenamiento_wesad.PARAMETROS_XGB)
+    - procesos: Folds simultáneos (None = núcleos disponibles)
+
+    Retorna:
+    - Lista de diccionarios (uno por fold) con métricas y tiempos
+    """
+    procesos = procesos or os.cpu_count() or 1
+    procesos = min(procesos, len(shards))
+    # Repartir los núcleos entre los folds simultáneos para no sobresuscribir la CPU
+    parametros = dict(parametros or {})
+    parametros.setdefault('nthread', max(1, (os.cpu_count() or 1) // procesos))
+
+    rutas = [(s.subject, s.ruta_base) for s in shards]
+    resultados = []
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [pool.submit(_fold, s.subject, rutas, list(features), parametros) for s in shards]
+        for futuro in futuros:
+            resultado = futuro.result()
+            resultados.append(resultado)
+            print(f"   {resultado['subject']:>4} | acc={resultado['accuracy']:.3f} "
+                  f"f1={resultado['f1']:.3f} auc={resultado['roc_auc']:.3f} | "
+                  f"{resultado['segundos']:.1f} s")
+    return resultados
+
+
+def resumen(resultados):
+    """Media y desviación de cada métrica entre folds (ignorando AUC no definidas)."""
+    return {
+        m: {'media': float(np.nanmean([r[m] for r in resultados])),
+            'desviacion': float(np.nanstd([r[m] for r in resultados]))}
+        for m in METRICAS
+    }
+
+
+if __name__ == "__main__":
+    def argumento(nombre, defecto=None):
+        if nombre in sys.argv:
+            return sys.argv[sys.argv.index(nombre) + 1]
+        return defecto
+
+    procesos = argumento('--procesos')
+    arboles = argumento('--arboles')
+    shards = construir_shards(ruta_wesad=argumento('--datos'),
+                              procesos=int(procesos) if procesos else None)
+
+    print(f"\nEvaluación LOSO: {len(shards)} folds")
+    inicio = time.perf_counter()
+    resultados = evaluar_loso(
+        shards,
+        parametros={'n_estimators': int(arboles)} if arboles else None,
+        procesos=int(procesos) if procesos else None,
+    )
+    total = time.perf_counter() - inicio
+
+    estadisticas = resumen(resultados)
+    print("\n" + "="*60)
+    for metrica, valor in estadisticas.items():
+        print(f"   {metrica:10} {valor['media']:.3f} ± {valor['desviacion']:.3f}")
+    print(f"   Tiempo total: {total:.1f} s "
+          f"(suma de folds: {sum(r['segundos'] for r in resultados):.1f} s)")
+    print("="*60)
+
+    salida = argumento('--json')
+    if salida:
+        with open(salida, 'w') as f:
+            json.dump({'folds': resultados, 'resumen': estadisticas, 'segundos': total}, f, indent=2)
+        print(f"Resultados guardados en {salida}")
@@ -0,0 +1,196 @@
+"""
+Métricas de bajo coste para el camino lectura -> modelo -> envío -> receptor -> chatbot
+- Contador: inc() suma en un atributo
+- Histograma: cubetas fijas, observar() con bisect (no guarda muestras)
+- Tiempos con time.perf_counter() (reloj monotónico): observar_desde(inicio) registra
+  en milisegundos el tiempo transcurrido desde 'inicio'
+Registrar un evento cuesta unos cientos de nanosegundos (ver medir_coste()).
+
+Exportación:
+- texto(): instantánea en formato de exposición de Prometheus
+- servir_http(puerto): la misma instantánea en http://127.0.0.1:<puerto>/metrics
+
+Las actualizaciones no toman locks: con varios hilos algún incremento simultáneo
+puede perderse, lo que se acepta a cambio del coste por evento.
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Cubetas por defecto para tiempos en milisegundos
+LIMITES_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000]
+
+
+class Contador:
+    __slots__ = ('nombre', 'ayuda', 'valor')
+
+    def __init__(self, nombre, ayuda=''):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.valor = 0
+
+    def inc(self, cantidad=1):
+        self.valor += cantidad
+
+    def exposicion(self):
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter",
+                f"{self.nombre} {self.valor}"]
+
+
+class Histograma:
+    """Histograma de cubetas fijas: observar() es O(log cubetas) y no guarda las muestras."""
+
+    __slots__ = ('nombre', 'ayuda', 'limites', 'cuentas', 'total', 'suma', 'maximo')
+
+    def __init__(self, limites=LIMITES_MS, nombre='', ayuda=''):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.limites = list(limites)
+        self.cuentas = [0] * (len(self.limites) + 1)   # última cubeta: > último límite
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.cuentas[bisect.bisect_left(self.limites, valor)] += 1
+        self.total += 1
+        self.suma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def observar_desde(self, inicio):
+        """Registra los milisegundos transcurridos desde inicio (time.perf_counter())."""
+        valor = (time.perf_counter() - inicio) * 1000
+        self.cuentas[bisect.bisect_left(self.limites, valor)] += 1
+        self.total += 1
+        self.suma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    @property
+    def media(self):
+        return self.suma / self.total if self.total else 0.0
+
+    def percentil(self, p):
+        """Límite superior de la cubeta donde cae el percentil p (0-100)."""
+        if not self.total:
+            return 0.0
+        objetivo = p / 100 * self.total
+        acumulado = 0
+        for i, cuenta in enumerate(self.cuentas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return self.limites[i] if i < len(self.limites) else self.maximo
+        return self.maximo
+
+    def texto(self, unidad=''):
+        """Una línea por cubeta con su barra, para imprimir en consola."""
+        lineas = []
+        mayor = max(self.cuentas) or 1
+        anterior = 0
+        for i, cuenta in enumerate(self.cuentas):
+            if cuenta:
+                etiqueta = f"≤{self.limites[i]:g}{unidad}" if i < len(self.limites) else f">{anterior:g}{unidad}"
+                lineas.append(f"   {etiqueta:>10} {cuenta:>9} {'█' * max(1, round(30 * cuenta / mayor))}")
+            if i < len(self.limites):
+                anterior = self.limites[i]
+        return "\n".join(lineas)
+
+    def exposicion(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        acumulado = 0
+        for limite, cuenta in zip(self.limites, self.cuentas):
+            acumulado += cuenta
+            lineas.append(f'{self.nombre}_bucket{{le="{limite:g}"}} {acumulado}')
+        lineas.append(f'{self.nombre}_bucket{{le="+Inf"}} {self.total}')
+        lineas.append(f"{self.nombre}_sum {self.suma:.6f}")
+        lineas.append(f"{self.nombre}_count {self.total}")
+        return lineas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas con nombre; contador() / histograma() crean o devuelven la existente."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    def _obtener(self, nombre, fabrica):
+        metrica = self._metricas.get(nombre)
+        if metrica is None:
+            with self._lock:
+                metrica = self._metricas.setdefault(nombre, fabrica())
+        return metrica
+
+    def contador(self, nombre, ayuda=''):
+        return self._obtener(nombre, lambda: Contador(nombre, ayuda))
+
+    def histograma(self, nombre, ayuda='', limites=LIMITES_MS):
+        return self._obtener(nombre, lambda: Histograma(limites, nombre, ayuda))
+
+    def texto(self):
+        """Instantánea de todas las métricas (formato de exposición de Prometheus)."""
+        lineas = []
+        for nombre in sorted(self._metricas):
+            lineas.extend(self._metricas[nombre].exposicion())
+        return "\n".join(lineas) + "\n"
+
+    def servir_http(self, puerto, host='127.0.0.1'):
+        """Sirve texto() en http://host:puerto/metrics desde un hilo en segundo plano."""
+        registro = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                cuerpo = registro.texto().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self._servidor
+
+
+# Registro del proceso: los módulos registran aquí sus métricas
+METRICAS = RegistroMetricas()
+contador = METRICAS.contador
+histograma = METRICAS.histograma
+
+
+def medir_coste(n=200000):
+    """Nanosegundos por evento de Contador.inc, Histograma.observar y observar_desde."""
+    c = Contador('coste_contador')
+    h = Histograma(LIMITES_MS, 'coste_histograma')
+    resultados = {}
+
+    inicio = time.perf_counter()
+    for _ in range(n):
+        c.inc()
+    resultados['contador_ns'] = (time.perf_counter() - inicio) / n * 1e9
+
+    inicio = time.perf_counter()
+    for i in range(n):
+        h.observar(0.7)
+    resultados['histograma_ns'] = (time.perf_counter() - inicio) / n * 1e9
+
+    inicio = time.perf_counter()
+    for _ in range(n):
+        h.observar_desde(inicio)
+    resultados['temporizador_ns'] = (time.perf_counter() - inicio) / n * 1e9
+    return resultados
+
+
+if __name__ == "__main__":
+    for nombre, ns in medir_coste().items():
+        print(f"   {nombre:18} {ns:7.1f} ns/evento")
@@ -0,0 +1,134 @@
+"""
+Motor de Alertas - Decide cuándo abrir el chatbot
+Agrupa las alertas por usuario/sesión y aplica:
+- Histéresis: hacen falta varias alertas seguidas para entrar en estado de estrés
+  y un periodo sin alertas para salir de él
+- Enfriamiento: tiempo mínimo entre dos aperturas para la misma sesión
+- Cubo de tokens por sesión: límite de aperturas por minuto de cada sesión, de modo
+  que una sesión muy activa no agota el cupo de las demás (opcionalmente, además,
+  un cubo global pasado en 'cubo')
+Así un estrés sostenido produce una sola decisión de apertura en lugar de una
+consulta al gestor de chatbot (lock + psutil) por cada alerta.
+"""
+
+import time
+from collections import deque
+
+
+class CuboTokens:
+    """Cubo de tokens clásico: 'capacidad' tokens, se recarga a 'tasa' tokens por segundo."""
+
+    def __init__(self, capacidad=3, tasa=1 / 20):
+        self.capacidad = float(capacidad)
+        self.tasa = float(tasa)
+        self.tokens = float(capacidad)
+        self._ultimo = None
+
+    def consumir(self, ahora, cantidad=1):
+        """Retorna True y descuenta si hay tokens suficientes."""
+        if self._ultimo is not None:
+            self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+        if self.tokens >= cantidad:
+            self.tokens -= cantidad
+            return True
+        return False
+
+
+class EstadoSesion:
+    """Estado de estrés de un usuario/sesión."""
+
+    def __init__(self, cubo):
+        self.cubo = cubo                  # CuboTokens de la sesión
+        self.alertas = deque()            # instantes de las alertas recientes
+        self.estresado = False
+        self.ultima_alerta = None
+        self.ultimo_lanzamiento = None
+
+
+class MotorAlertas:
+    """
+    Decide, alerta a alerta, si corresponde abrir el chatbot.
+
+    Args:
+        alertas_para_activar: alertas dentro de 'ventana_activacion' para pasar a estresado
+        ventana_activacion: segundos de la ventana de activación
+        segundos_para_liberar: segundos sin alertas para volver a estado normal
+        enfriamiento: segundos mínimos entre aperturas de una misma sesión
+        capacidad_cubo, tasa_cubo: CuboTokens de cada sesión (aperturas y aperturas/s)
+        cubo: CuboTokens global opcional, compartido por todas las sesiones
+    """
+
+    def __init__(self, alertas_para_activar=2, ventana_activacion=10.0,
+                 segundos_para_liberar=10.0, enfriamiento=60.0,
+                 capacidad_cubo=3, tasa_cubo=1 / 20, cubo=None):
+        self.alertas_para_activar = alertas_para_activar
+        self.ventana_activacion = ventana_activacion
+        self.segundos_para_liberar = segundos_para_liberar
+        self.enfriamiento = enfriamiento
+        self.capacidad_cubo = capacidad_cubo
+        self.tasa_cubo = tasa_cubo
+        self.cubo = cubo
+        self.sesiones = {}
+        self.estadisticas = {
+            'alertas': 0,
+            'lanzamientos': 0,
+            'en_histeresis': 0,
+            'en_enfriamiento': 0,
+            'limitadas': 0,
+        }
+
+    def registrar(self, clave, ahora=None, inmediata=False):
+        """
+        Registra una alerta de la sesión 'clave'.
+        Con inmediata=True la alerta basta para entrar en estrés (sin histéresis).
+        Retorna True si hay que abrir el chatbot.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        self.estadisticas['alertas'] += 1
+
+        sesion = self.sesiones.get(clave)
+        if sesion is None:
+            sesion = self.sesiones[clave] = EstadoSesion(CuboTokens(self.capacidad_cubo, self.tasa_cubo))
+
+        # Salida por histéresis: demasiado tiempo sin alertas
+        if sesion.ultima_alerta is not None and ahora - sesion.ultima_alerta >= self.segundos_para_liberar:
+            sesion.estresado = False
+            sesion.alertas.clear()
+        sesion.ultima_alerta = ahora
+
+        sesion.alertas.append(ahora)
+        while sesion.alertas[0] < ahora - self.ventana_activacion:
+            sesion.alertas.popleft()
+
+        if not sesion.estresado:
+            if not inmediata and len(sesion.alertas) < self.alertas_para_activar:
+                self.estadisticas['en_histeresis'] += 1
+                return False
+            sesion.estresado = True
+
+        if sesion.ultimo_lanzamiento is not None and ahora - sesion.ultimo_lanzamiento < self.enfriamiento:
+            self.estadisticas['en_enfriamiento'] += 1
+            return False
+
+        if not sesion.cubo.consumir(ahora):
+            self.estadisticas['limitadas'] += 1
+            return False
+        if self.cubo is not None and not self.cubo.consumir(ahora):
+            sesion.cubo.tokens += 1   # la apertura no ocurre: devolver el token de la sesión
+            self.estadisticas['limitadas'] += 1
+            return False
+
+        sesion.ultimo_lanzamiento = ahora
+        self.estadisticas['lanzamientos'] += 1
+        return True
+
+    def purgar(self, ahora=None):
+        """Elimina sesiones inactivas (sin alertas ni enfriamiento pendiente)."""
+        ahora = time.monotonic() if ahora is None else ahora
+        limite = max(self.segundos_para_liberar, self.enfriamiento)
+        inactivas = [c for c, s in self.sesiones.items()
+                     if s.ultima_alerta is None or ahora - s.ultima_alerta >= limite]
+        for clave in inactivas:
+            del self.sesiones[clave]
+        return len(inactivas)
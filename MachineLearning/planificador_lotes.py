@@ -0,0 +1,156 @@
+"""
+Planificador de micro-lotes para inferencia
+Junta las lecturas que llegan una a una en lotes acotados por tamaño y por espera
+máxima (p. ej. 64 filas o 5 ms, lo que ocurra primero), ejecuta una sola
+predicción vectorizada por lote y devuelve a cada llamador su parte del resultado.
+
+- enviar(datos): no bloquea, retorna un Future con el resultado de esas filas
+- await evaluar(datos): igual, esperando el resultado
+- Histogramas: filas por lote y espera en cola (ms) de cada envío, registrados en
+  METRICAS (planificador_filas_lote, planificador_espera_ms) y compartidos entre instancias
+"""
+
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from metricas import histograma
+
+# Valores por defecto de los parámetros ajustables
+TAM_LOTE = 64
+ESPERA_MAXIMA_MS = 5.0
+
+LIMITES_TAM_LOTE = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+LIMITES_ESPERA_MS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 250, 1000]
+
+
+class _Envio:
+    __slots__ = ('datos', 'contexto', 'futuro', 'llegada')
+
+    def __init__(self, datos, contexto, futuro, llegada):
+        self.datos = datos
+        self.contexto = contexto
+        self.futuro = futuro
+        self.llegada = llegada
+
+
+class PlanificadorLotes:
+    """
+    Agrupa envíos en lotes y los evalúa con funcion_lote(datos, contexto).
+
+    Args:
+        funcion_lote: recibe los datos concatenados del lote (y el contexto concatenado,
+            o None) y retorna un array con un resultado por fila, o None si los
+            llamadores no esperan resultado
+        tam_lote: filas máximas por lote (un envío más grande sale solo en su lote)
+        espera_maxima_ms: espera máxima del envío más antiguo antes de evaluar
+    """
+
+    def __init__(self, funcion_lote, tam_lote=TAM_LOTE, espera_maxima_ms=ESPERA_MAXIMA_MS):
+        self.funcion_lote = funcion_lote
+        self.tam_lote = tam_lote
+        self.espera_maxima_ms = espera_maxima_ms
+        self.hist_tam_lote = histograma(
+            'planificador_filas_lote', 'Filas por lote evaluado', LIMITES_TAM_LOTE)
+        self.hist_espera_ms = histograma(
+            'planificador_espera_ms', 'Espera en cola de cada envío (ms)', LIMITES_ESPERA_MS)
+        self.lotes = 0
+        self.filas = 0
+        self._pendientes = deque()
+        self._filas_pendientes = 0
+        self._hay_datos = None
+        self._lleno = None
+        self._tarea = None
+
+    def iniciar(self):
+        """Arranca el bucle de lotes en el event loop actual."""
+        self._hay_datos = asyncio.Event()
+        self._lleno = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+        return self._tarea
+
+    def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+
+    def enviar(self, datos, contexto=None):
+        """Encola filas (array de n filas); retorna un Future con sus n resultados."""
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendientes.append(_Envio(datos, contexto, futuro, time.perf_counter()))
+        self._filas_pendientes += len(datos)
+        self._hay_datos.set()
+        if self._filas_pendientes >= self.tam_lote:
+            self._lleno.set()
+        return futuro
+
+    async def evaluar(self, datos, contexto=None):
+        return await self.enviar(datos, contexto)
+
+    async def _esperar_lote(self):
+        """Espera hasta completar tam_lote filas o agotar la espera del envío más antiguo."""
+        limite = self._pendientes[0].llegada + self.espera_maxima_ms / 1000
+        while self._filas_pendientes < self.tam_lote:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                return
+            self._lleno.clear()
+            try:
+                await asyncio.wait_for(self._lleno.wait(), restante)
+            except asyncio.TimeoutError:
+                return
+
+    def _tomar_lote(self):
+        """Saca de la cola envíos completos hasta tam_lote filas (al menos uno)."""
+        tomados = []
+        filas = 0
+        while self._pendientes and (not tomados or filas + len(self._pendientes[0].datos) <= self.tam_lote):
+            envio = self._pendientes.popleft()
+            tomados.append(envio)
+            filas += len(envio.datos)
+        self._filas_pendientes -= filas
+        if not self._pendientes:
+            self._hay_datos.clear()
+        return tomados, filas
+
+    async def _bucle(self):
+        while True:
+            await self._hay_datos.wait()
+            await self._esperar_lote()
+            tomados, filas = self._tomar_lote()
+
+            salida = time.perf_counter()
+            for envio in tomados:
+                self.hist_espera_ms.observar((salida - envio.llegada) * 1000)
+            self.hist_tam_lote.observar(filas)
+            self.lotes += 1
+            self.filas += filas
+
+            datos = np.concatenate([e.datos for e in tomados]) if len(tomados) > 1 else tomados[0].datos
+            contexto = None
+            if tomados[0].contexto is not None:
+                contexto = (np.concatenate([e.contexto for e in tomados])
+                            if len(tomados) > 1 else tomados[0].contexto)
+            try:
+                resultados = self.funcion_lote(datos, contexto)
+            except Exception as e:
+                for envio in tomados:
+                    if not envio.futuro.done():
+                        envio.futuro.set_exception(e)
+                continue
+
+            inicio = 0
+            for envio in tomados:
+                fin = inicio + len(envio.datos)
+                if not envio.futuro.done():
+                    envio.futuro.set_result(None if resultados is None else resultados[inicio:fin])
+                inicio = fin
+
+    def resumen(self):
+        """Línea con los percentiles de tamaño de lote y espera en cola."""
+        t = self.hist_tam_lote
+        e = self.hist_espera_ms
+        return (f"lotes={self.lotes} filas={self.filas} | filas/lote media={t.media:.1f} "
+                f"p50≤{t.percentil(50):g} p99≤{t.percentil(99):g} | espera ms media={e.media:.2f} "
+                f"p50≤{e.percentil(50):g} p99≤{e.percentil(99):g}")
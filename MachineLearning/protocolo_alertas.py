@@ -0,0 +1,340 @@
+"""
+Protocolo de alertas sobre una conexión TCP persistente
+Cada mensaje viaja como una trama: 4 bytes (longitud, big-endian) + cuerpo.
+- EmisorAlertas: cliente que mantiene la conexión abierta y se reconecta solo
+- LectorTramas: reconstruye los mensajes aunque lleguen partidos o juntos en recv()
+
+Formatos del cuerpo (se negocian al abrir la conexión):
+- 'json': un diccionario JSON en UTF-8 por trama
+- 'binario-v1': lote de registros fijos de 24 bytes (little-endian)
+      ts (float64) | seq (uint32) | bvp (float32) | eda (float32) | temp (float32)
+
+Negociación: el cliente envía en JSON {"tipo": "negociar", "formatos": [...]} y el
+receptor responde {"tipo": "negociar", "formato": <elegido>}. Si no hay respuesta
+(receptor antiguo) el cliente sigue en JSON.
+
+En una conexión binaria, un mensaje que no es una lectura viaja como JSON en una
+trama con el bit alto de la longitud activado (MARCA_JSON). Una trama marcada se lee
+como JSON en cualquier formato (así avisa servidor_inferencia a los dispositivos).
+"""
+
+import json
+import select
+import socket
+import struct
+import time
+
+import numpy as np
+
+from metricas import contador, histograma
+
+HOST = '127.0.0.1'
+PORT = 65432
+
+_CABECERA = struct.Struct('!I')
+# Límite de seguridad para no reservar memoria por una longitud corrupta
+TAMANO_MAXIMO_TRAMA = 1 << 20
+# Bit alto de la longitud: trama JSON dentro de una conexión binaria
+MARCA_JSON = 1 << 31
+
+FORMATO_JSON = 'json'
+FORMATO_BINARIO = 'binario-v1'
+FORMATOS_SOPORTADOS = (FORMATO_BINARIO, FORMATO_JSON)
+
+CANALES = ('bvp', 'eda', 'temp')
+_CLAVES_REGISTRO = frozenset(CANALES + ('ts', 'seq'))
+_REGISTRO = struct.Struct('<dIfff')
+REGISTRO_DTYPE = np.dtype([('ts', '<f8'), ('seq', '<u4'),
+                           ('bvp', '<f4'), ('eda', '<f4'), ('temp', '<f4')])
+
+
+class ErrorProtocolo(Exception):
+    """Trama inválida o corrupta en el flujo."""
+
+
+def _trama(cuerpo, marca=0):
+    return _CABECERA.pack(len(cuerpo) | marca) + cuerpo
+
+
+def empaquetar(mensaje, marca=0):
+    """Serializa un diccionario como trama JSON lista para sendall()."""
+    return _trama(json.dumps(mensaje, separators=(',', ':')).encode('utf-8'), marca)
+
+
+def es_registro(mensaje):
+    """True si el mensaje cabe en un registro binario (solo bvp, eda, temp, ts, seq)."""
+    return mensaje.keys() <= _CLAVES_REGISTRO and all(c in mensaje for c in CANALES)
+
+
+def empaquetar_registros(mensajes, seq_inicial=0):
+    """
+    Serializa lecturas {bvp, eda, temp[, ts, seq]} como una sola trama binaria.
+    Si falta 'ts' se usa la hora actual; si falta 'seq' se numeran desde seq_inicial.
+    """
+    ahora = time.time()
+    cuerpo = b''.join(
+        _REGISTRO.pack(m.get('ts', ahora), m.get('seq', seq_inicial + i) & 0xFFFFFFFF,
+                       m['bvp'], m['eda'], m['temp'])
+        for i, m in enumerate(mensajes)
+    )
+    return _trama(cuerpo)
+
+
+def decodificar_registros(cuerpo):
+    """Cuerpo de una trama binaria -> array estructurado (REGISTRO_DTYPE)."""
+    if len(cuerpo) % REGISTRO_DTYPE.itemsize:
+        raise ErrorProtocolo(f"Trama binaria de {len(cuerpo)} bytes no es múltiplo "
+                             f"de {REGISTRO_DTYPE.itemsize}")
+    return np.frombuffer(cuerpo, dtype=REGISTRO_DTYPE)
+
+
+def _registros_a_dicts(registros, extra):
+    """Array de registros -> lista de diccionarios con las mismas claves que el JSON."""
+    bvp, eda, temp = (registros[c].astype(np.float64).tolist() for c in CANALES)
+    ts = registros['ts'].tolist()
+    seq = registros['seq'].tolist()
+    return [dict(extra, bvp=b, eda=e, temp=t, ts=s_ts, seq=s)
+            for b, e, t, s_ts, s in zip(bvp, eda, temp, ts, seq)]
+
+
+class LectorTramas:
+    """
+    Acumula los bytes recibidos y extrae los mensajes completos.
+    - Atiende la negociación de formato: tras leer la petición deja la respuesta
+      en respuesta_pendiente() para que el servidor la envíe.
+    - Compatibilidad: si la conexión empieza con '{' se asume el formato antiguo
+      (un JSON suelto por conexión) y el mensaje se entrega al cerrar().
+    - Con registros=True cada trama binaria se entrega como un array
+      estructurado (REGISTRO_DTYPE) en lugar de una lista de diccionarios.
+    """
+
+    def __init__(self, formatos=FORMATOS_SOPORTADOS, registros=False):
+        self._buffer = bytearray()
+        self.registros = registros
+        self._respuesta = b''
+        self.formatos = formatos
+        self.formato = FORMATO_JSON
+        self.negociado = False
+        self.legado = None   # None = aún no se sabe, True/False tras el primer byte
+        self.usuario = None  # declarado en la negociación (opcional)
+
+    def respuesta_pendiente(self):
+        """Bytes que el servidor debe enviar al cliente (respuesta de negociación)."""
+        respuesta, self._respuesta = self._respuesta, b''
+        return respuesta
+
+    def _control(self, mensaje):
+        """Procesa un mensaje de negociación (petición en el servidor, respuesta en el cliente)."""
+        if 'formatos' in mensaje:
+            self.formato = next((f for f in mensaje['formatos'] if f in self.formatos), FORMATO_JSON)
+            self.usuario = mensaje.get('usuario')
+            self._respuesta += empaquetar({'tipo': 'negociar', 'formato': self.formato})
+        else:
+            self.formato = mensaje.get('formato', FORMATO_JSON)
+        self.negociado = True
+
+    def _decodificar(self, cuerpo, mensajes, es_json=False):
+        if self.formato == FORMATO_BINARIO and not es_json:
+            if self.registros:
+                mensajes.append(decodificar_registros(cuerpo))
+                return
+            extra = {'usuario': self.usuario} if self.usuario else {}
+            mensajes.extend(_registros_a_dicts(decodificar_registros(cuerpo), extra))
+            return
+        mensaje = json.loads(cuerpo.decode('utf-8'))
+        if isinstance(mensaje, dict) and mensaje.get('tipo') == 'negociar':
+            self._control(mensaje)
+            return
+        mensajes.append(mensaje)
+
+    def alimentar(self, datos):
+        """Añade bytes recibidos; retorna la lista de mensajes completos."""
+        self._buffer += datos
+        if self.legado is None and self._buffer:
+            self.legado = self._buffer[:1] == b'{'
+        if self.legado:
+            return []
+
+        mensajes = []
+        inicio = 0
+        disponible = len(self._buffer)
+        while disponible - inicio >= _CABECERA.size:
+            (longitud,) = _CABECERA.unpack_from(self._buffer, inicio)
+            es_json = bool(longitud & MARCA_JSON)
+            longitud &= ~MARCA_JSON
+            if longitud > TAMANO_MAXIMO_TRAMA:
+                raise ErrorProtocolo(f"Trama de {longitud} bytes supera el máximo")
+            fin = inicio + _CABECERA.size + longitud
+            if fin > disponible:
+                break
+            self._decodificar(bytes(self._buffer[inicio + _CABECERA.size:fin]), mensajes, es_json)
+            inicio = fin
+        del self._buffer[:inicio]
+        return mensajes
+
+    def cerrar(self):
+        """Fin de la conexión: entrega el mensaje pendiente del formato antiguo, si lo hay."""
+        if self.legado and self._buffer:
+            mensaje = json.loads(self._buffer.decode('utf-8'))
+            self._buffer.clear()
+            return [mensaje]
+        return []
+
+
+_hist_envio = histograma('envio_ms', 'sendall() de las alertas al receptor (ms)')
+_mensajes_enviados = contador('envio_mensajes', 'Alertas enviadas al receptor')
+_fallos_envio = contador('envio_fallos', 'Envíos que no llegaron al receptor')
+
+
+class EmisorAlertas:
+    """
+    Cliente con conexión persistente al receptor.
+    Si el envío falla cierra el socket y reintenta conectar en el siguiente
+    envío, esperando 'espera_reconexion' segundos entre intentos (con backoff).
+
+    Por defecto envía JSON. Con formato='binario-v1' se negocia el formato binario
+    al conectar: las lecturas {bvp, eda, temp[, ts, seq]} van como registros y
+    cualquier otro mensaje como trama JSON marcada (MARCA_JSON).
+    'usuario' identifica la sesión: en binario se declara en la negociación y en
+    JSON se añade a cada mensaje que no lo traiga.
+    """
+
+    def __init__(self, host=HOST, port=PORT, timeout=0.5,
+                 espera_reconexion=0.5, espera_maxima=10.0,
+                 formato=FORMATO_JSON, usuario=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.espera_base = espera_reconexion
+        self.espera_maxima = espera_maxima
+        self.formato_preferido = formato
+        self.usuario = usuario
+        self.formato = FORMATO_JSON   # formato acordado en la conexión actual
+        self._espera = espera_reconexion
+        self._socket = None
+        self._proximo_intento = 0.0
+        self._seq = 0
+        self.enviados = 0
+        self.bytes_enviados = 0
+        self.conexiones = 0
+        self.ultimo_error = None
+
+    @property
+    def conectado(self):
+        return self._socket is not None
+
+    def _sigue_abierto(self):
+        """Detecta si el receptor cerró la conexión (recv sin bloquear devuelve b'')."""
+        legibles, _, _ = select.select([self._socket], [], [], 0)
+        if not legibles:
+            return True
+        try:
+            return self._socket.recv(1, socket.MSG_PEEK) != b''
+        except OSError:
+            return False
+
+    def _negociar(self, s):
+        """Propone el formato preferido; sin respuesta a tiempo se queda en JSON."""
+        self.formato = FORMATO_JSON
+        if self.formato_preferido == FORMATO_JSON:
+            return
+        peticion = {'tipo': 'negociar', 'formatos': [self.formato_preferido, FORMATO_JSON]}
+        if self.usuario:
+            peticion['usuario'] = self.usuario
+        s.sendall(empaquetar(peticion))
+
+        lector = LectorTramas()
+        limite = time.monotonic() + self.timeout
+        while not lector.negociado and time.monotonic() < limite:
+            try:
+                datos = s.recv(4096)
+            except socket.timeout:
+                break
+            if not datos:
+                raise ConnectionResetError("El receptor cerró la conexión durante la negociación")
+            lector.alimentar(datos)
+        self.formato = lector.formato
+
+    def _conectar(self):
+        if self._socket is not None:
+            if self._sigue_abierto():
+                return True
+            self.cerrar()
+        if time.monotonic() < self._proximo_intento:
+            return False
+        try:
+            s = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._socket = s
+            self._negociar(s)
+            self._espera = self.espera_base
+            self.conexiones += 1
+            return True
+        except OSError as e:
+            self._fallo(e)
+            return False
+
+    def _fallo(self, error):
+        self.ultimo_error = error
+        self.cerrar()
+        self._proximo_intento = time.monotonic() + self._espera
+        self._espera = min(self._espera * 2, self.espera_maxima)
+
+    def _serializar(self, mensajes):
+        if self.formato != FORMATO_BINARIO:
+            if self.usuario:
+                mensajes = [m if 'usuario' in m else dict(m, usuario=self.usuario) for m in mensajes]
+            return b''.join(empaquetar(m) for m in mensajes)
+        # Lecturas consecutivas en una trama binaria; el resto, una trama JSON cada uno
+        tramas = []
+        lecturas = []
+        for m in mensajes:
+            if es_registro(m):
+                lecturas.append(m)
+                continue
+            if lecturas:
+                tramas.append(empaquetar_registros(lecturas, self._seq))
+                self._seq += len(lecturas)
+                lecturas = []
+            tramas.append(empaquetar(m, MARCA_JSON))
+        if lecturas:
+            tramas.append(empaquetar_registros(lecturas, self._seq))
+            self._seq += len(lecturas)
+        return b''.join(tramas)
+
+    def enviar(self, mensaje):
+        """Envía un mensaje; retorna False si el receptor no está disponible."""
+        return self.enviar_varios([mensaje])
+
+    def enviar_varios(self, mensajes):
+        """Envía varios mensajes con un solo sendall(); retorna True si salieron todos."""
+        if not self._conectar():
+            _fallos_envio.inc()
+            return False
+        datos = self._serializar(mensajes)
+        inicio = time.perf_counter()
+        try:
+            self._socket.sendall(datos)
+            _hist_envio.observar_desde(inicio)
+            _mensajes_enviados.inc(len(mensajes))
+            self.enviados += len(mensajes)
+            self.bytes_enviados += len(datos)
+            return True
+        except OSError as e:
+            _fallos_envio.inc()
+            self._fallo(e)
+            return False
+
+    def cerrar(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
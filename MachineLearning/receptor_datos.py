@@ -1,88 +1,237 @@
-import socket
+import asyncio
 import json
+import time
+from collections import deque
 from datetime import datetime
+import numpy as np
 import chatbot_manager  # Gestor de chatbot
-import signal
+from metricas import METRICAS, contador, histograma
+from motor_alertas import MotorAlertas
+from protocolo_alertas import LectorTramas, ErrorProtocolo
+from sesiones import GrabadorSesion
 import sys
 
 HOST = '127.0.0.1'  # Localhost
 PORT = 65432        # Puerto de escucha
 
-# Variable para controlar el bucle
-servidor_activo = True
+# Contador global de alertas
+alerta_count = 0
 
-def signal_handler(sig, frame):
-    """Maneja la señal Ctrl+C para cerrar el servidor correctamente"""
-    global servidor_activo
-    print("\n\n" + "="*60)
-    print("🛑 Señal de interrupción recibida (Ctrl+C)")
-    print("🧹 Cerrando servidor de forma segura...")
-    print("="*60)
-    servidor_activo = False
-
-# Registrar el manejador de señales
-signal.signal(signal.SIGINT, signal_handler)
-
-print("="*60)
-print("🚨 SISTEMA DE ALERTAS DE ESTRÉS - RECEPTOR ACTIVO 🚨")
-print(f"Escuchando en {HOST}:{PORT}")
-print("="*60)
-print("💡 Presiona Ctrl+C para detener el servidor")
-print("\n⏳ Esperando alertas de estrés...\n")
-
-# Crear el socket servidor
-try:
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Permitir reutilizar puerto
-        s.settimeout(1.0)  # Timeout de 1 segundo para permitir verificar la señal
-        s.bind((HOST, PORT))
-        s.listen()
-        
-        alerta_count = 0
-        while servidor_activo:
-            try:
-                # Esperar conexión del Flet (con timeout)
-                conn, addr = s.accept()
-                with conn:
-                    # Recibimos los datos
-                    data = conn.recv(4096)
-                    if data:
-                        try:
-                            # Convertimos de bytes a texto y luego a Diccionario
-                            mensaje = json.loads(data.decode('utf-8'))
-                            alerta_count += 1
-                            
-                            timestamp = datetime.now().strftime("%H:%M:%S")
-                            print("\n" + "="*60)
-                            print(f"⚠️  ALERTA #{alerta_count} - USUARIO ESTRESADO - [{timestamp}] ⚠️")
-                            print("="*60)
-                            print(f" > BVP:            {mensaje.get('bvp'):.6f}")
-                            print(f" > EDA:            {mensaje.get('eda'):.6f}")
-                            print(f" > Temperatura:    {mensaje.get('temp'):.6f}")
-                            print(f"\n📊 Datos completos: {mensaje}")
-                            print("="*60)
-                            
-                            # 🚀 ABRIR CHATBOT AUTOMÁTICAMENTE AL DETECTAR ESTRÉS
-                            print("\n🤖 Verificando estado del chatbot...")
-                            chatbot_manager.abrir_chatbot_por_estres()
-                            print()
-                            
-                        except json.JSONDecodeError:
-                            print("❌ Error al decodificar JSON")
-            
-            except socket.timeout:
-                # Timeout normal, continuar esperando
-                continue
-            except OSError as e:
-                if servidor_activo:
-                    print(f"⚠️ Error de socket: {e}")
+# Latencia de ingesta (ms): desde que llegan los bytes hasta que la alerta se procesa
+latencias_ms = deque(maxlen=10000)
+
+# Tarea del lanzamiento del chatbot en curso (se ejecuta en un hilo aparte)
+lanzamiento_chatbot = None
+
+# Decide cuándo una racha de alertas justifica abrir el chatbot
+motor = MotorAlertas()
+
+# Grabación opcional de la sesión: python receptor_datos.py --grabar sesion.sgs
+grabador = None
+
+# Métricas del receptor; python receptor_datos.py --metricas 9100 las sirve por HTTP
+_alertas_recibidas = contador('receptor_alertas', 'Alertas recibidas')
+_hist_ingesta = histograma('receptor_ingesta_ms', 'Llegada de los bytes -> alerta procesada (ms)')
+_hist_decision = histograma('receptor_decision_ms', 'Decisión del motor de alertas (ms)')
+_solicitudes_chatbot = contador('receptor_chatbot_solicitudes', 'Rachas que piden abrir el chatbot')
+_hist_chatbot = histograma('receptor_chatbot_ms', 'Lanzamiento del chatbot (ms)')
+
+
+def procesar_alerta(mensaje, sesion=''):
+    """
+    Muestra una alerta recibida: un diccionario JSON o un array de registros de una
+    trama binaria (se muestra una vez, con la última lectura, y cuenta todas).
+    Una sola línea por alerta: la consola se escribe desde el event loop y cada
+    print suma a la latencia de ingesta.
+    """
+    global alerta_count
+    if isinstance(mensaje, np.ndarray):
+        n = len(mensaje)
+        bvp, eda, temp = (float(mensaje[c][-1]) for c in ('bvp', 'eda', 'temp'))
+    else:
+        n = 1
+        bvp, eda, temp = (mensaje.get(c, float('nan')) for c in ('bvp', 'eda', 'temp'))
+    alerta_count += n
+
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    lecturas = f" ({n} lecturas)" if n > 1 else ""
+    print(f"⚠️  ALERTA #{alerta_count}{lecturas} - USUARIO ESTRESADO [{timestamp}] {sesion} "
+          f"| BVP {bvp:.6f} | EDA {eda:.6f} | Temp {temp:.6f}")
+
+
+def solicitar_chatbot():
+    """
+    🚀 ABRIR CHATBOT AUTOMÁTICAMENTE AL DETECTAR ESTRÉS
+    abrir_chatbot_por_estres() bloquea ~1.5 s, así que corre en un hilo; mientras
+    un lanzamiento está en curso las alertas nuevas no lanzan otro.
+    """
+    global lanzamiento_chatbot
+    if lanzamiento_chatbot is not None and not lanzamiento_chatbot.done():
+        return
+    print("🤖 Verificando estado del chatbot...")
+    _solicitudes_chatbot.inc()
+    lanzamiento_chatbot = asyncio.create_task(asyncio.to_thread(_abrir_chatbot))
+
+
+def _abrir_chatbot():
+    inicio = time.perf_counter()
+    try:
+        return chatbot_manager.abrir_chatbot_por_estres()
+    finally:
+        _hist_chatbot.observar_desde(inicio)
+
+
+async def procesar_cola(cola, motor_alertas, grabador_sesion=None, al_procesar=None):
+    """
+    Consume las alertas encoladas por los clientes, fuera del camino de recepción.
+    al_procesar(mensaje), si se pasa, se llama cuando la alerta ya pasó por el motor.
+    """
+    while True:
+        mensaje, clave, legado, recibido = await cola.get()
+        latencias_ms.append((time.perf_counter() - recibido) * 1000)
+        registros = isinstance(mensaje, np.ndarray)
+        n = len(mensaje) if registros else 1
+        _alertas_recibidas.inc(n)
+        try:
+            if grabador_sesion is not None:
+                # Un fallo de la grabación no debe impedir procesar la alerta
+                try:
+                    if registros:
+                        grabador_sesion.agregar_registros(mensaje)
+                    else:
+                        grabador_sesion.agregar(mensaje)
+                except Exception as e:
+                    print(f"⚠️ No se pudo grabar la lectura: {e}")
+            procesar_alerta(mensaje, clave)
+            inicio = time.perf_counter()
+            # Un cliente antiguo abre una conexión por alerta: no hay racha que acumular,
+            # así que cada alerta cuenta como confirmada (como en el receptor original)
+            activar = False
+            for _ in range(n):
+                activar |= motor_alertas.registrar(clave, inmediata=legado)
+            _hist_decision.observar_desde(inicio)
+            if activar:
+                solicitar_chatbot()
+            _hist_ingesta.observar_desde(recibido)
+            if al_procesar is not None:
+                al_procesar(mensaje)
+            if alerta_count % 1000 < n:
+                motor_alertas.purgar()
+        except Exception as e:
+            print(f"❌ Error al procesar alerta: {e}")
+        finally:
+            cola.task_done()
+
+
+async def atender_cliente(reader, writer, cola):
+    """
+    Atiende una conexión persistente: lee tramas hasta que el cliente cierra.
+    Solo decodifica y encola; el procesamiento lo hace procesar_cola.
+    Las tramas binarias se encolan como arrays de registros, sin pasarlas a diccionarios.
+    """
+    addr = writer.get_extra_info('peername')
+    # Sin 'usuario', cada conexión es una sesión: varios clientes detrás del mismo
+    # host (localhost, NAT) no comparten histéresis, enfriamiento ni límite
+    origen = f"{addr[0]}:{addr[1]}"
+    lector = LectorTramas(registros=True)
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
                 break
+            recibido = time.perf_counter()
+            for mensaje in lector.alimentar(data):
+                # Sesión: 'usuario' del mensaje o de la negociación, si no la conexión
+                usuario = None if isinstance(mensaje, np.ndarray) else mensaje.get('usuario')
+                cola.put_nowait((mensaje, usuario or lector.usuario or origen, False, recibido))
+            # Respuesta a la negociación de formato (JSON o binario), si la hubo
+            respuesta = lector.respuesta_pendiente()
+            if respuesta:
+                writer.write(respuesta)
+                await writer.drain()
+        # Cliente con el formato antiguo: un JSON por conexión
+        for mensaje in lector.cerrar():
+            cola.put_nowait((mensaje, mensaje.get('usuario') or origen, True, time.perf_counter()))
+    except (json.JSONDecodeError, UnicodeDecodeError, ErrorProtocolo):
+        print(f"❌ Error al decodificar mensaje de {addr[0]}:{addr[1]}")
+    except OSError as e:
+        print(f"⚠️ Conexión con {addr[0]}:{addr[1]} interrumpida: {e}")
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+def resumen_latencias():
+    """Imprime p50 / p99 de la latencia de ingesta"""
+    if not latencias_ms:
+        return
+    ordenadas = sorted(latencias_ms)
+    p50 = ordenadas[len(ordenadas) // 2]
+    p99 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.99))]
+    print(f"📈 Latencia de ingesta ({len(ordenadas)} alertas): p50 = {p50:.3f} ms | p99 = {p99:.3f} ms")
+
+
+async def main(host=HOST, port=PORT, motor_alertas=None, grabador_sesion=None, al_procesar=None):
+    """
+    Arranca el receptor hasta que se cancela la tarea.
+    Por defecto usa el motor del módulo; la grabación y al_procesar son opcionales.
+    """
+    cola = asyncio.Queue()
+    trabajador = asyncio.create_task(
+        procesar_cola(cola, motor_alertas or motor, grabador_sesion, al_procesar))
+
+    # reuse_address permite reutilizar el puerto tras reiniciar
+    servidor = await asyncio.start_server(
+        lambda r, w: atender_cliente(r, w, cola), host, port, reuse_address=True
+    )
+
+    print("="*60)
+    print("🚨 SISTEMA DE ALERTAS DE ESTRÉS - RECEPTOR ACTIVO 🚨")
+    print(f"Escuchando en {host}:{port}")
+    print("="*60)
+    print("💡 Presiona Ctrl+C para detener el servidor")
+    print("\n⏳ Esperando alertas de estrés...\n")
+
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servidor.close()
+        await servidor.wait_closed()
+        trabajador.cancel()
+        await asyncio.gather(trabajador, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    if '--grabar' in sys.argv:
+        ruta_grabacion = sys.argv[sys.argv.index('--grabar') + 1]
+        grabador = GrabadorSesion(ruta_grabacion)
+        print(f"📼 Grabando lecturas recibidas en {ruta_grabacion}")
+    if '--metricas' in sys.argv:
+        puerto_metricas = int(sys.argv[sys.argv.index('--metricas') + 1])
+        METRICAS.servir_http(puerto_metricas)
+        print(f"📊 Métricas en http://127.0.0.1:{puerto_metricas}/metrics")
 
-except KeyboardInterrupt:
-    print("\n🛑 Interrupción detectada")
-except Exception as e:
-    print(f"\n❌ Error crítico: {e}")
-finally:
-    print("\n✅ Servidor cerrado correctamente")
-    print("👋 Hasta luego\n")
-    sys.exit(0)
\ No newline at end of file
+    try:
+        asyncio.run(main(grabador_sesion=grabador))
+    except KeyboardInterrupt:
+        print("\n\n" + "="*60)
+        print("🛑 Señal de interrupción recibida (Ctrl+C)")
+        print("🧹 Cerrando servidor de forma segura...")
+        print("="*60)
+    except Exception as e:
+        print(f"\n❌ Error crítico: {e}")
+    finally:
+        resumen_latencias()
+        if grabador is not None:
+            grabador.cerrar()
+            print(f"📼 {grabador.grabadas} lecturas grabadas en {grabador.ruta}")
+        print(f"🧮 Motor de alertas: {motor.estadisticas}")
+        if '--metricas' in sys.argv:
+            print(f"\n📊 Métricas:\n{METRICAS.texto()}")
+        print("\n✅ Servidor cerrado correctamente")
+        print("👋 Hasta luego\n")
+        sys.exit(0)
@@ -0,0 +1,134 @@
+"""
+Registro de Modelos - Carga única por proceso
+Mantiene en memoria cada artefacto cargado (pickle del pipeline, modelo compilado...)
+identificado por su ruta y su firma en disco (mtime + tamaño + hash).
+Si el archivo cambia, la siguiente consulta lo vuelve a cargar.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+
+def _firma_archivo(ruta):
+    """Firma barata del archivo: (mtime en ns, tamaño en bytes)."""
+    info = os.stat(ruta)
+    return info.st_mtime_ns, info.st_size
+
+
+def hash_archivo(ruta):
+    """SHA-256 del contenido del archivo (el registro solo lo calcula al cargar o si cambió la firma)."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class _Entrada:
+    """Artefacto cargado junto con su firma y métricas de carga."""
+
+    def __init__(self, artefacto, firma, hash_contenido, segundos):
+        self.artefacto = artefacto
+        self.firma = firma
+        self.hash = hash_contenido
+        self.cargas = 1
+        self.aciertos = 0
+        self.ultima_carga_ms = segundos * 1000
+        self.total_carga_ms = segundos * 1000
+
+
+class RegistroModelos:
+    """
+    Cache de artefactos por ruta absoluta.
+    - obtener(): retorna el artefacto, cargándolo solo si no está o si cambió en disco
+    - metricas(): cargas, aciertos y tiempos de carga por ruta
+    """
+
+    def __init__(self, cargador=joblib.load):
+        self.cargador = cargador
+        self._entradas = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, ruta, cargador=None):
+        """
+        Retorna el artefacto de 'ruta'.
+        Parámetros:
+        - ruta: Archivo del modelo
+        - cargador: Función ruta -> objeto (por defecto joblib.load)
+        """
+        ruta = os.path.abspath(ruta)
+        firma = _firma_archivo(ruta)
+
+        with self._lock:
+            entrada = self._entradas.get(ruta)
+            if entrada is not None and entrada.firma == firma:
+                entrada.aciertos += 1
+                return entrada.artefacto
+
+            # Firma distinta: si el contenido es el mismo (p. ej. 'touch') no se recarga
+            hash_contenido = hash_archivo(ruta)
+            if entrada is not None and entrada.hash == hash_contenido:
+                entrada.firma = firma
+                entrada.aciertos += 1
+                return entrada.artefacto
+
+            inicio = time.perf_counter()
+            artefacto = (cargador or self.cargador)(ruta)
+            segundos = time.perf_counter() - inicio
+
+            if entrada is None:
+                self._entradas[ruta] = _Entrada(artefacto, firma, hash_contenido, segundos)
+            else:
+                print(f"🔄 Modelo modificado en disco, recargado: {os.path.basename(ruta)}")
+                entrada.artefacto = artefacto
+                entrada.firma = firma
+                entrada.hash = hash_contenido
+                entrada.cargas += 1
+                entrada.ultima_carga_ms = segundos * 1000
+                entrada.total_carga_ms += segundos * 1000
+            return artefacto
+
+    def invalidar(self, ruta=None):
+        """Olvida un artefacto (o todos si ruta es None) para forzar la recarga."""
+        with self._lock:
+            if ruta is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(os.path.abspath(ruta), None)
+
+    def metricas(self):
+        """Diccionario ruta -> métricas de carga."""
+        with self._lock:
+            return {
+                ruta: {
+                    'cargas': e.cargas,
+                    'aciertos': e.aciertos,
+                    'ultima_carga_ms': e.ultima_carga_ms,
+                    'total_carga_ms': e.total_carga_ms,
+                    'sha256': e.hash,
+                }
+                for ruta, e in self._entradas.items()
+            }
+
+
+# Registro compartido por todo el proceso
+_registro = RegistroModelos()
+
+
+def obtener_modelo(ruta, cargador=None):
+    """Atajo al registro del proceso: ver RegistroModelos.obtener."""
+    return _registro.obtener(ruta, cargador)
+
+
+def metricas_modelos():
+    """Atajo al registro del proceso: ver RegistroModelos.metricas."""
+    return _registro.metricas()
+
+
+def invalidar_modelo(ruta=None):
+    """Atajo al registro del proceso: ver RegistroModelos.invalidar."""
+    _registro.invalidar(ruta)
@@ -0,0 +1,381 @@
+"""
+Servidor de inferencia multi-dispositivo
+Los relojes envían sus lecturas (no solo las alertas) y el servidor decide el estrés:
+- Un único modelo compartido (pipeline .pkl o modelo compilado .npz) para todas las sesiones
+- Las lecturas de todas las sesiones se agrupan en micro-lotes (planificador_lotes:
+  hasta --lote filas o --espera-ms de espera): una sola llamada vectorizada al
+  modelo por lote en lugar de una por lectura
+- El estado de cada sesión vive en arrays NumPy indexados por una ranura
+  (TablaSesiones), no en un objeto por dispositivo
+- Opcional: calibración por usuario (calibracion_usuario) aplicada en bloque
+- Cuando el MotorAlertas de una sesión decide abrir el chatbot, se envía al
+  dispositivo una trama JSON {"tipo": "alerta", ...} marcada con MARCA_JSON, que el
+  dispositivo lee como JSON aunque la conexión use el formato binario
+
+Mismo protocolo que el receptor (protocolo_alertas); cada dispositivo se identifica
+con 'usuario' en la negociación o en su primer mensaje JSON (si no, por su dirección).
+
+Uso:
+    python servidor_inferencia.py [--compilado modelo.npz] [--calibrar carpeta] [--lote 64] [--espera-ms 5]
+    python servidor_inferencia.py carga <dispositivos> [--hz 4] [--segundos 10]
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+from motor_alertas import MotorAlertas
+from planificador_lotes import ESPERA_MAXIMA_MS, TAM_LOTE, PlanificadorLotes
+from protocolo_alertas import (CANALES, MARCA_JSON, REGISTRO_DTYPE, ErrorProtocolo,
+                               LectorTramas, empaquetar, empaquetar_registros)
+from stress_model import UMBRAL_ESTRES, predict_stress_batch
+
+HOST = '127.0.0.1'
+PUERTO_INFERENCIA = 65433
+# Espera máxima (s) a que se evalúen las lecturas en cola de una conexión que se cierra
+ESPERA_CIERRE = 1.0
+
+
+class TablaSesiones:
+    """
+    Estado de todas las sesiones en arrays columnares; cada sesión ocupa una ranura.
+    Varias conexiones con la misma clave comparten la ranura (se cuentan referencias);
+    la ranura se libera al cerrar la última y después se reutiliza.
+    """
+
+    def __init__(self, capacidad=1024):
+        self.claves = {}          # clave de sesión -> ranura
+        self.referencias = {}     # clave de sesión -> conexiones abiertas
+        self._libres = []
+        self._siguiente = 0
+        self._reservar(capacidad)
+
+    def _reservar(self, capacidad):
+        canales = len(CANALES)
+        nuevos = {
+            'lecturas': np.zeros(capacidad, np.uint64),
+            'lecturas_estres': np.zeros(capacidad, np.uint64),
+            'ultima_prob': np.zeros(capacidad, np.float32),
+            'ultimo_seq': np.zeros(capacidad, np.uint32),
+            'ultimo_ts': np.zeros(capacidad, np.float64),
+            'cal_n': np.zeros(capacidad, np.uint32),
+            'cal_alfa': np.zeros(capacidad, np.float64),
+            'cal_media': np.zeros((capacidad, canales), np.float64),
+            'cal_varianza': np.zeros((capacidad, canales), np.float64),
+        }
+        for nombre, arreglo in nuevos.items():
+            anterior = getattr(self, nombre, None)
+            if anterior is not None:
+                arreglo[:len(anterior)] = anterior
+            setattr(self, nombre, arreglo)
+        self.capacidad = capacidad
+
+    def abrir(self, clave, calibracion=None):
+        """Asigna una ranura a la sesión (la misma si ya estaba abierta)."""
+        ranura = self.claves.get(clave)
+        if ranura is not None:
+            self.referencias[clave] += 1
+            return ranura
+        if self._libres:
+            ranura = self._libres.pop()
+        else:
+            if self._siguiente == self.capacidad:
+                self._reservar(self.capacidad * 2)
+            ranura = self._siguiente
+            self._siguiente += 1
+        for nombre in ('lecturas', 'lecturas_estres', 'ultima_prob', 'ultimo_seq', 'ultimo_ts'):
+            getattr(self, nombre)[ranura] = 0
+        if calibracion is not None:
+            self.cal_n[ranura] = calibracion.n
+            self.cal_alfa[ranura] = calibracion.alfa
+            self.cal_media[ranura] = calibracion.media
+            self.cal_varianza[ranura] = calibracion.varianza
+        self.claves[clave] = ranura
+        self.referencias[clave] = 1
+        return ranura
+
+    def cerrar(self, clave, calibracion=None):
+        """
+        Cierra una conexión de la sesión; retorna True si con ella se liberó la ranura
+        (entonces, si se pasa una CalibracionUsuario, copia en ella el estado).
+        Cerrar una clave que no está abierta no hace nada.
+        """
+        if clave not in self.claves:
+            return False
+        self.referencias[clave] -= 1
+        if self.referencias[clave] > 0:
+            return False
+        del self.referencias[clave]
+        ranura = self.claves.pop(clave)
+        if calibracion is not None:
+            calibracion.n = int(self.cal_n[ranura])
+            calibracion.media = self.cal_media[ranura].tolist()
+            calibracion.varianza = self.cal_varianza[ranura].tolist()
+        self._libres.append(ranura)
+        return True
+
+    @property
+    def activas(self):
+        return len(self.claves)
+
+    def calibrar(self, ranuras, X, medias_poblacion, desv_poblacion, minimo):
+        """Versión vectorizada de CalibracionUsuario.calibrar (estado previo al lote)."""
+        media = self.cal_media[ranuras]
+        varianza = self.cal_varianza[ranuras]
+        peso = np.minimum(1.0, self.cal_n[ranuras] / minimo)[:, None] if minimo else 1.0
+        valida = varianza > 1e-12
+        z = (X - media) / np.sqrt(np.where(valida, varianza, 1.0))
+        calibrada = (1.0 - peso) * X + peso * (medias_poblacion + z * desv_poblacion)
+        return np.where(valida, calibrada, X)
+
+    def actualizar_calibracion(self, ranuras, X):
+        """
+        Versión vectorizada de CalibracionUsuario.actualizar.
+        Si una sesión aparece varias veces en el lote se aplica por rondas
+        (k-ésima lectura de cada sesión en la ronda k), en el orden de llegada.
+        """
+        orden = np.argsort(ranuras, kind='stable')
+        ordenadas = ranuras[orden]
+        inicio_grupo = np.r_[True, ordenadas[1:] != ordenadas[:-1]]
+        posicion = np.arange(len(ordenadas))
+        rango = posicion - np.maximum.accumulate(np.where(inicio_grupo, posicion, 0))
+        for ronda in range(int(rango.max()) + 1 if len(rango) else 0):
+            filas = orden[rango == ronda]
+            r = ranuras[filas]
+            self.cal_n[r] += 1
+            alfa = np.maximum(self.cal_alfa[r], 1.0 / self.cal_n[r])[:, None]
+            diferencia = X[filas] - self.cal_media[r]
+            incremento = alfa * diferencia
+            self.cal_media[r] += incremento
+            self.cal_varianza[r] = (1.0 - alfa) * (self.cal_varianza[r] + diferencia * incremento)
+
+    def registrar(self, ranuras, registros, prob_estres, etiquetas):
+        """Acumula contadores y guarda la última lectura de cada sesión."""
+        np.add.at(self.lecturas, ranuras, 1)
+        np.add.at(self.lecturas_estres, ranuras, etiquetas.astype(np.uint64))
+        # Con ranuras repetidas la asignación deja el último valor del lote
+        self.ultima_prob[ranuras] = prob_estres
+        self.ultimo_seq[ranuras] = registros['seq']
+        self.ultimo_ts[ranuras] = registros['ts']
+
+
+def _registros_desde_json(mensaje):
+    return np.array([(mensaje.get('ts', time.time()), mensaje.get('seq', 0),
+                      mensaje['bvp'], mensaje['eda'], mensaje['temp'])], dtype=REGISTRO_DTYPE)
+
+
+class ServidorInferencia:
+    """
+    Recibe lecturas de muchos dispositivos y las evalúa en micro-lotes.
+
+    Args:
+        modelo: Pipeline (stress_model.load_model) o ModeloCompilado (arbol_compilado)
+        calibraciones: AlmacenCalibraciones opcional
+        umbral: Probabilidad de estrés a partir de la cual la lectura cuenta como estrés
+        motor: MotorAlertas (decide cuándo avisar a cada dispositivo; histéresis,
+            enfriamiento y límite de aperturas son por sesión)
+        tam_lote, espera_maxima_ms: límites de los micro-lotes (PlanificadorLotes)
+    """
+
+    def __init__(self, modelo, calibraciones=None, umbral=UMBRAL_ESTRES, motor=None,
+                 tam_lote=TAM_LOTE, espera_maxima_ms=ESPERA_MAXIMA_MS):
+        self.modelo = modelo
+        self.calibraciones = calibraciones
+        self.umbral = umbral
+        self.motor = motor or MotorAlertas()
+        self.sesiones = TablaSesiones()
+        self.escritores = {}      # ranura -> StreamWriters de las conexiones de la sesión
+        self.planificador = PlanificadorLotes(self._evaluar_planificado, tam_lote, espera_maxima_ms)
+        self._referencia = None
+        if calibraciones is not None:
+            if hasattr(modelo, 'named_steps'):
+                from calibracion_usuario import referencia_poblacion
+                medias, desviaciones = referencia_poblacion(modelo)
+            else:
+                medias, desviaciones = modelo.media, modelo.escala
+            self._referencia = (np.asarray(medias), np.asarray(desviaciones))
+        self.estadisticas = {'lecturas': 0, 'lotes': 0, 'alertas': 0, 'segundos_modelo': 0.0}
+
+    def _probabilidades(self, X):
+        """P(estrés) para un lote (n, 3) con el modelo compartido."""
+        if hasattr(self.modelo, 'named_steps'):
+            return predict_stress_batch(X, self.modelo, self.umbral)[1][:, 1]
+        return self.modelo.predict_proba(X)[:, 1]
+
+    def evaluar_lote(self, ranuras, registros):
+        """Una llamada al modelo para todas las lecturas del lote; retorna las ranuras con alerta."""
+        X = np.column_stack([registros[c] for c in CANALES]).astype(np.float64)
+        if self._referencia is not None:
+            X_modelo = self.sesiones.calibrar(ranuras, X, *self._referencia, self.calibraciones.minimo)
+            self.sesiones.actualizar_calibracion(ranuras, X)
+        else:
+            X_modelo = X
+
+        inicio = time.perf_counter()
+        prob_estres = self._probabilidades(X_modelo)
+        self.estadisticas['segundos_modelo'] += time.perf_counter() - inicio
+
+        etiquetas = prob_estres > self.umbral
+        self.sesiones.registrar(ranuras, registros, prob_estres, etiquetas)
+        self.estadisticas['lecturas'] += len(ranuras)
+        self.estadisticas['lotes'] += 1
+
+        # Solo las lecturas con estrés pasan por el motor de alertas
+        ahora = time.monotonic()
+        return [int(r) for r in ranuras[etiquetas] if self.motor.registrar(int(r), ahora)]
+
+    def _avisar(self, ranura):
+        escritores = self.escritores.get(ranura)
+        if not escritores:
+            return
+        self.estadisticas['alertas'] += 1
+        trama = empaquetar({
+            'tipo': 'alerta',
+            'prob_estres': float(self.sesiones.ultima_prob[ranura]),
+            'seq': int(self.sesiones.ultimo_seq[ranura]),
+        }, MARCA_JSON)
+        for escritor in escritores:
+            escritor.write(trama)
+
+    def _evaluar_planificado(self, registros, ranuras):
+        """funcion_lote del planificador: evalúa y envía las alertas; sin resultado por fila."""
+        try:
+            for r in self.evaluar_lote(ranuras, registros):
+                self._avisar(r)
+        except Exception as e:
+            print(f"❌ Error al evaluar lote: {e}")
+
+    async def atender(self, reader, writer):
+        """Una conexión = un dispositivo; sus lecturas se encolan con la ranura de su sesión."""
+        addr = writer.get_extra_info('peername')
+        lector = LectorTramas(registros=True)
+        clave = None
+        ranura = None
+        pendiente = None    # Future del último envío al planificador
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                mensajes = lector.alimentar(data)
+                respuesta = lector.respuesta_pendiente()
+                if respuesta:
+                    writer.write(respuesta)
+                if ranura is None and (mensajes or lector.negociado):
+                    primero = mensajes[0] if mensajes and isinstance(mensajes[0], dict) else {}
+                    clave = lector.usuario or primero.get('usuario') or f"{addr[0]}:{addr[1]}"
+                    calibracion = self.calibraciones.obtener(clave) if self.calibraciones else None
+                    ranura = self.sesiones.abrir(clave, calibracion)
+                    self.escritores.setdefault(ranura, []).append(writer)
+                for mensaje in mensajes:
+                    registros = mensaje if isinstance(mensaje, np.ndarray) else _registros_desde_json(mensaje)
+                    pendiente = self.planificador.enviar(registros, np.full(len(registros), ranura, np.int64))
+        except (json.JSONDecodeError, UnicodeDecodeError, KeyError, ErrorProtocolo):
+            print(f"❌ Trama inválida de {addr[0]}:{addr[1]}")
+        except OSError:
+            pass
+        finally:
+            if ranura is not None:
+                # Las lecturas aún en cola deben evaluarse con esta ranura antes de liberarla
+                # (el planificador evalúa en orden de llegada: basta esperar el último envío)
+                if pendiente is not None and not pendiente.done():
+                    await asyncio.wait({pendiente}, timeout=ESPERA_CIERRE)
+                self.escritores[ranura].remove(writer)
+                calibracion = self.calibraciones.obtener(clave) if self.calibraciones is not None else None
+                if self.sesiones.cerrar(clave, calibracion):
+                    del self.escritores[ranura]
+                    # La ranura se reutilizará: el motor no debe heredar el estado de esta sesión
+                    self.motor.sesiones.pop(ranura, None)
+                    if calibracion is not None:
+                        self.calibraciones.guardar(clave)
+            writer.close()
+
+    async def iniciar(self, host=HOST, port=PUERTO_INFERENCIA):
+        """Arranca el servidor y el planificador de lotes; retorna el asyncio.Server."""
+        self.planificador.iniciar()
+        return await asyncio.start_server(self.atender, host, port, reuse_address=True)
+
+    def resumen(self):
+        e = self.estadisticas
+        lotes = max(e['lotes'], 1)
+        return (f"{e['lecturas']} lecturas en {e['lotes']} lotes "
+                f"(media {e['lecturas'] / lotes:.1f} filas/lote, "
+                f"{e['segundos_modelo'] / lotes * 1000:.3f} ms de modelo/lote) | "
+                f"sesiones activas: {self.sesiones.activas} | alertas enviadas: {e['alertas']}\n"
+                f"   {self.planificador.resumen()}")
+
+
+async def simular_dispositivos(n, hz=4.0, segundos=10.0, host=HOST, port=PUERTO_INFERENCIA):
+    """Genera carga: n dispositivos enviando una lectura binaria cada 1/hz segundos."""
+    rng = np.random.default_rng(0)
+
+    async def dispositivo(i):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(empaquetar({'tipo': 'negociar', 'formatos': ['binario-v1'],
+                                 'usuario': f"reloj-{i:05d}"}))
+        await reader.read(4096)
+        await asyncio.sleep(rng.uniform(0, 1 / hz))   # desfasar los dispositivos
+        for seq in range(int(segundos * hz)):
+            writer.write(empaquetar_registros([{
+                'seq': seq, 'bvp': float(rng.normal(0, 20)),
+                'eda': float(rng.uniform(0.3, 3.5)), 'temp': float(rng.uniform(31, 34)),
+            }]))
+            await asyncio.sleep(1 / hz)
+        writer.close()
+
+    await asyncio.gather(*(dispositivo(i) for i in range(n)))
+
+
+async def main(modelo, calibraciones, tam_lote, espera_maxima_ms):
+    servidor = ServidorInferencia(modelo, calibraciones, tam_lote=tam_lote,
+                                  espera_maxima_ms=espera_maxima_ms)
+    red = await servidor.iniciar()
+    print("="*60)
+    print("🧠 SERVIDOR DE INFERENCIA MULTI-DISPOSITIVO")
+    print(f"Escuchando en {HOST}:{PUERTO_INFERENCIA}")
+    print("="*60)
+    try:
+        async with red:
+            while True:
+                await asyncio.sleep(10)
+                servidor.motor.purgar()
+                print(f"📈 {servidor.resumen()}")
+    finally:
+        print(f"📈 {servidor.resumen()}")
+        print("📊 Filas por lote:\n" + servidor.planificador.hist_tam_lote.texto())
+        print("📊 Espera en cola:\n" + servidor.planificador.hist_espera_ms.texto(' ms'))
+
+
+if __name__ == "__main__":
+    def argumento(nombre, defecto=None):
+        if nombre in sys.argv:
+            return sys.argv[sys.argv.index(nombre) + 1]
+        return defecto
+
+    if len(sys.argv) > 2 and sys.argv[1] == 'carga':
+        n = int(sys.argv[2])
+        inicio = time.perf_counter()
+        asyncio.run(simular_dispositivos(n, float(argumento('--hz', 4)), float(argumento('--segundos', 10))))
+        print(f"🔌 {n} dispositivos simulados durante {time.perf_counter() - inicio:.1f} s")
+        sys.exit(0)
+
+    if argumento('--compilado'):
+        from arbol_compilado import cargar_modelo_compilado
+        modelo = cargar_modelo_compilado(argumento('--compilado'))
+    else:
+        from stress_model import load_model
+        modelo = load_model()
+
+    calibraciones = None
+    if argumento('--calibrar'):
+        from calibracion_usuario import AlmacenCalibraciones
+        calibraciones = AlmacenCalibraciones(argumento('--calibrar'))
+
+    try:
+        asyncio.run(main(modelo, calibraciones, int(argumento('--lote', TAM_LOTE)),
+                         float(argumento('--espera-ms', ESPERA_MAXIMA_MS))))
+    except KeyboardInterrupt:
+        print("\n🛑 Servidor de inferencia detenido")
@@ -0,0 +1,267 @@
+"""
+Grabación y reproducción de sesiones de sensores
+Archivo append-only y columnar (.sgs):
+    cabecera 'SGSES1\\n'
+    bloques: n (uint32) + columnas ts, seq, bvp, eda, temp (n valores cada una)
+Los tipos de cada columna son los del registro binario de protocolo_alertas.
+
+Uso:
+    python sesiones.py info <sesion.sgs>
+    python sesiones.py sintetica <sesion.sgs> [--segundos 600] [--hz 4]
+    python sesiones.py reproducir <sesion.sgs> [--velocidad 1|N|max] [--destino receptor|inferencia]
+
+Para grabar lo que llega al receptor: python receptor_datos.py --grabar <sesion.sgs>
+"""
+
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from protocolo_alertas import REGISTRO_DTYPE
+
+CABECERA = b'SGSES1\n'
+_N = struct.Struct('<I')
+COLUMNAS = REGISTRO_DTYPE.names
+
+
+class GrabadorSesion:
+    """
+    Acumula lecturas en memoria y las añade al archivo por bloques columnares.
+    Nunca reescribe lo ya guardado: si el proceso se corta solo se pierde el bloque en curso.
+    """
+
+    def __init__(self, ruta, tam_bloque=256):
+        self.ruta = ruta
+        self.tam_bloque = tam_bloque
+        self.grabadas = 0
+        self._pendientes = []     # lecturas sueltas (tuplas) aún no pasadas a array
+        self._bloques = []        # arrays de registros pendientes, en orden de llegada
+        self._n_pendientes = 0
+        if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+            with open(ruta, 'wb') as f:
+                f.write(CABECERA)
+        else:
+            with open(ruta, 'rb') as f:
+                if f.read(len(CABECERA)) != CABECERA:
+                    raise ValueError(f"{ruta} no es un archivo de sesión válido")
+
+    def agregar(self, lectura):
+        """Añade una lectura {bvp, eda, temp[, ts, seq]}."""
+        self._pendientes.append((
+            lectura.get('ts', time.time()),
+            lectura.get('seq', self.grabadas + self._n_pendientes),
+            lectura['bvp'], lectura['eda'], lectura['temp'],
+        ))
+        self._n_pendientes += 1
+        if self._n_pendientes >= self.tam_bloque:
+            self.vaciar()
+
+    def agregar_registros(self, registros):
+        """Añade un array de registros (REGISTRO_DTYPE) tal cual llega en una trama binaria."""
+        self._pasar_a_bloque()
+        self._bloques.append(registros)
+        self._n_pendientes += len(registros)
+        if self._n_pendientes >= self.tam_bloque:
+            self.vaciar()
+
+    def _pasar_a_bloque(self):
+        if self._pendientes:
+            self._bloques.append(np.array(self._pendientes, dtype=REGISTRO_DTYPE))
+            self._pendientes = []
+
+    def vaciar(self):
+        """Escribe el bloque pendiente al final del archivo."""
+        self._pasar_a_bloque()
+        if not self._bloques:
+            return
+        bloque = np.concatenate(self._bloques) if len(self._bloques) > 1 else self._bloques[0]
+        with open(self.ruta, 'ab') as f:
+            f.write(_N.pack(len(bloque)))
+            for columna in COLUMNAS:
+                f.write(np.ascontiguousarray(bloque[columna]).tobytes())
+        self.grabadas += len(bloque)
+        self._bloques = []
+        self._n_pendientes = 0
+
+    def cerrar(self):
+        self.vaciar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def leer_sesion(ruta):
+    """Lee todos los bloques de una sesión; retorna un array estructurado (REGISTRO_DTYPE)."""
+    bloques = []
+    with open(ruta, 'rb') as f:
+        if f.read(len(CABECERA)) != CABECERA:
+            raise ValueError(f"{ruta} no es un archivo de sesión válido")
+        while True:
+            cabecera = f.read(_N.size)
+            if len(cabecera) < _N.size:
+                break
+            (n,) = _N.unpack(cabecera)
+            bloque = np.empty(n, dtype=REGISTRO_DTYPE)
+            completo = True
+            for columna in COLUMNAS:
+                tipo = REGISTRO_DTYPE[columna]
+                datos = f.read(n * tipo.itemsize)
+                if len(datos) < n * tipo.itemsize:
+                    completo = False   # bloque truncado (grabación interrumpida)
+                    break
+                bloque[columna] = np.frombuffer(datos, dtype=tipo)
+            if not completo:
+                break
+            bloques.append(bloque)
+    if not bloques:
+        return np.empty(0, dtype=REGISTRO_DTYPE)
+    return np.concatenate(bloques)
+
+
+def generar_sintetica(ruta, segundos=600, hz=4, semilla=42):
+    """
+    Sesión sintética dentro de los rangos de muñeca de WESAD, alternando
+    tramos relajados y de estrés (EDA alta), para pruebas de carga.
+    """
+    rng = np.random.default_rng(semilla)
+    n = int(segundos * hz)
+    t = np.arange(n) / hz
+    estres = (t // 60) % 2 == 1   # minutos alternos
+    inicio = time.time()
+    with GrabadorSesion(ruta, tam_bloque=4096) as grabador:
+        for i in range(n):
+            grabador.agregar({
+                'ts': inicio + t[i],
+                'seq': i,
+                'bvp': float(rng.normal(0.0, 8.0)),
+                'eda': float(rng.uniform(2.0, 3.8) if estres[i] else rng.uniform(0.3, 1.0)),
+                'temp': float(rng.uniform(32.8, 33.2) if estres[i] else rng.uniform(31.5, 32.6)),
+            })
+    return n
+
+
+def _ritmo(registros, velocidad):
+    """
+    Agrupa los registros según el instante en que deben salir.
+    velocidad=None -> sin esperas (máxima velocidad), en lotes de 512.
+    """
+    if velocidad is None:
+        for inicio in range(0, len(registros), 512):
+            yield 0.0, registros[inicio:inicio + 512]
+        return
+    relativos = (registros['ts'] - registros['ts'][0]) / velocidad
+    cortes = np.flatnonzero(np.diff(relativos) > 0.001) + 1
+    for grupo in np.split(np.arange(len(registros)), cortes):
+        yield relativos[grupo[0]], registros[grupo]
+
+
+def reproducir(registros, velocidad=1.0, destino='receptor', pipeline=None):
+    """
+    Reproduce una sesión hacia el receptor (por socket) o directamente contra el modelo.
+    Cada grupo de lecturas se evalúa con predict_stress_batch; al receptor solo se
+    envían las que el modelo clasifica como estrés, igual que hace simu_reloj
+    (el receptor trata cada mensaje como una alerta confirmada).
+    Retorna un diccionario con el resumen de la reproducción.
+    """
+    from protocolo_alertas import FORMATO_BINARIO, EmisorAlertas
+    from stress_model import load_model, predict_stress_batch
+
+    if pipeline is None:
+        pipeline = load_model()
+    emisor = EmisorAlertas(formato=FORMATO_BINARIO) if destino == 'receptor' else None
+    latencias = []
+    lecturas = 0
+    enviados = 0
+    fallidos = 0
+    estres = 0
+    inicio = time.perf_counter()
+
+    for instante, grupo in _ritmo(registros, velocidad):
+        espera = inicio + instante - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+
+        t0 = time.perf_counter()
+        X = np.column_stack([grupo['bvp'], grupo['eda'], grupo['temp']]).astype(np.float64)
+        etiquetas, _ = predict_stress_batch(X, pipeline)
+        latencias.append((time.perf_counter() - t0) * 1000)
+        estres += int(etiquetas.sum())
+        lecturas += len(grupo)
+
+        if destino == 'receptor' and etiquetas.any():
+            alertas = [{'ts': float(r['ts']), 'seq': int(r['seq']), 'bvp': float(r['bvp']),
+                        'eda': float(r['eda']), 'temp': float(r['temp'])}
+                       for r in grupo[etiquetas == 1]]
+            if emisor.enviar_varios(alertas):
+                enviados += len(alertas)
+            else:
+                fallidos += len(alertas)
+
+    duracion = time.perf_counter() - inicio
+    if emisor is not None:
+        emisor.cerrar()
+
+    resumen = {
+        'lecturas': lecturas,
+        'segundos': duracion,
+        'lecturas_por_segundo': lecturas / duracion if duracion > 0 else float('inf'),
+        'lecturas_con_estres': estres,
+    }
+    if emisor is not None:
+        resumen['alertas_enviadas'] = enviados
+        resumen['alertas_fallidas'] = fallidos
+    if latencias:
+        resumen['latencia_lote_p50_ms'] = float(np.percentile(latencias, 50))
+        resumen['latencia_lote_p99_ms'] = float(np.percentile(latencias, 99))
+    return resumen
+
+
+def _argumento(nombre, defecto):
+    if nombre in sys.argv:
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return defecto
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    comando, ruta = sys.argv[1], sys.argv[2]
+
+    if comando == 'info':
+        registros = leer_sesion(ruta)
+        print(f"📼 {ruta}: {len(registros)} lecturas")
+        if len(registros):
+            print(f"   Duración: {registros['ts'][-1] - registros['ts'][0]:.1f} s")
+            for canal in ('bvp', 'eda', 'temp'):
+                print(f"   {canal:5} min={registros[canal].min():8.3f}  max={registros[canal].max():8.3f}")
+
+    elif comando == 'sintetica':
+        n = generar_sintetica(ruta, float(_argumento('--segundos', 600)), float(_argumento('--hz', 4)))
+        print(f"📼 Sesión sintética guardada en {ruta} ({n} lecturas)")
+
+    elif comando == 'reproducir':
+        velocidad = _argumento('--velocidad', '1')
+        velocidad = None if velocidad == 'max' else float(velocidad)
+        destino = _argumento('--destino', 'receptor')
+        registros = leer_sesion(ruta)
+
+        from stress_model import load_model
+        pipeline = load_model()
+
+        print(f"▶️  Reproduciendo {len(registros)} lecturas hacia {destino} "
+              f"a velocidad {'máxima' if velocidad is None else f'{velocidad:g}x'}...")
+        resumen = reproducir(registros, velocidad, destino, pipeline)
+        for clave, valor in resumen.items():
+            print(f"   {clave:24} {valor:.3f}" if isinstance(valor, float) else f"   {clave:24} {valor}")
+
+    else:
+        print(__doc__)
+        sys.exit(1)
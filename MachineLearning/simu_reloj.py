@@ -1,14 +1,20 @@
 import flet as ft
 import asyncio
-import socket
-import json
 import math
-from stress_model import load_model, predict_stress
+import sys
+import time
+from metricas import METRICAS, contador, histograma
+from stress_model import load_model, PredictorEstres
+from protocolo_alertas import EmisorAlertas
 
 # Configuración de red
 HOST = '127.0.0.1'
 PORT = 65432
 
+# Métricas del simulador; python simu_reloj.py --metricas 9101 las sirve por HTTP
+_lecturas = contador('simulador_lecturas', 'Lecturas tomadas de los sliders')
+_hist_ciclo = histograma('simulador_ciclo_ms', 'Lectura -> predicción -> envío (ms)')
+
 async def main(page: ft.Page):
     page.title = "Simulador de Estrés - Empatica E4"
     page.vertical_alignment = "start"
@@ -18,6 +24,8 @@ async def main(page: ft.Page):
     # Cargar modelo al inicio
     print("Cargando modelo de Machine Learning...")
     pipeline = load_model()
+    # Una sola evaluación por lectura, compartida por sliders y envío periódico
+    predictor = PredictorEstres(pipeline)
     print("Modelo cargado exitosamente.")
 
     # RANGOS REALES DEL DATASET WESAD (basados en análisis estadístico)
@@ -146,15 +154,11 @@ async def main(page: ft.Page):
             eda = float(valores["eda"].value)
             temp = float(valores["temp"].value)
             
-            # Predecir con probabilidades
-            prediccion = predict_stress(bvp, temp, eda, pipeline)
-            
-            # Obtener probabilidades directamente del modelo
-            import pandas as pd
-            X = pd.DataFrame([[bvp, eda, temp]], columns=['bvp', 'eda', 'temp'])
-            probabilidades = pipeline.predict_proba(X)[0]
-            prob_sin_estres = probabilidades[0] * 100
-            prob_con_estres = probabilidades[1] * 100
+            # Predecir con probabilidades (una sola pasada por el pipeline)
+            resultado = predictor.predecir(bvp, temp, eda)
+            prediccion = resultado.prediccion
+            prob_sin_estres = resultado.prob_sin_estres * 100
+            prob_con_estres = resultado.prob_con_estres * 100
             
             # Actualizar UI según resultado
             if prediccion == 1:
@@ -259,36 +263,34 @@ async def main(page: ft.Page):
     #  🔥 ENVÍO DE DATOS POR PUERTO 🔥
     # ================================
     async def auto_guardado():
-        contador = 0
+        n_monitoreo = 0
+        # Una sola conexión para todas las alertas; se reconecta si el receptor se reinicia
+        emisor = EmisorAlertas(HOST, PORT, timeout=0.5)
         while True: 
             try:
                 # 1. Recopilar datos
+                inicio = time.perf_counter()
                 datos = {n: float(v.value) for n, v in valores.items()}
+                _lecturas.inc()
                 
-                # 2. Calcular predicción
-                prediccion = predict_stress(datos['bvp'], datos['temp'], datos['eda'], pipeline)
+                # 2. Calcular predicción (reutiliza la del slider si no hubo cambios)
+                prediccion = predictor.predecir(datos['bvp'], datos['temp'], datos['eda']).prediccion
                 
                 # 3. SOLO ENVIAR SI HAY ESTRÉS
                 if prediccion == 1:
-                    print(f"⚠️ ESTRÉS DETECTADO - Enviando alerta #{contador}...")
+                    print(f"⚠️ ESTRÉS DETECTADO - Enviando alerta #{n_monitoreo}...")
                     
-                    try:
-                        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                            s.settimeout(0.5)
-                            s.connect((HOST, PORT))
-                            
-                            mensaje_bytes = json.dumps(datos).encode('utf-8')
-                            s.sendall(mensaje_bytes)
-                            print(" ✓ Alerta enviada con éxito.")
-                    
-                    except ConnectionRefusedError:
+                    if emisor.enviar(datos):
+                        print(" ✓ Alerta enviada con éxito.")
+                    elif isinstance(emisor.ultimo_error, ConnectionRefusedError):
                         print(" ✗ Error: Servidor receptor no disponible.")
-                    except Exception as ex:
-                        print(f" ✗ Error de red: {ex}")
+                    else:
+                        print(f" ✗ Error de red: {emisor.ultimo_error}")
                 else:
-                    print(f"✓ Monitoreo #{contador} - Estado: Normal")
+                    print(f"✓ Monitoreo #{n_monitoreo} - Estado: Normal")
+                _hist_ciclo.observar_desde(inicio)
 
-                contador += 1
+                n_monitoreo += 1
                 await asyncio.sleep(2)   # Esperar 2 segundos
 
             except Exception as e:
@@ -297,4 +299,9 @@ async def main(page: ft.Page):
 
     asyncio.create_task(auto_guardado())
 
+if '--metricas' in sys.argv:
+    puerto_metricas = int(sys.argv[sys.argv.index('--metricas') + 1])
+    METRICAS.servir_http(puerto_metricas)
+    print(f"📊 Métricas en http://127.0.0.1:{puerto_metricas}/metrics")
+
 ft.app(target=main, view=ft.WEB_BROWSER)
\ No newline at end of file
@@ -1,9 +1,18 @@
 # Código para guardar, cargar y hacer inferencia con el modelo de Random Forest.
 
+import time
 import joblib
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
+from registro_modelos import obtener_modelo
+from metricas import contador, histograma
+
+# Orden de columnas con el que se entrenó el pipeline
+FEATURES = ['bvp', 'eda', 'temp']
+
+# Umbral sobre P(estrés) que usa XGBClassifier.predict en clasificación binaria
+UMBRAL_ESTRES = 0.5
 
 # Función para guardar el modelo entrenado y el scaler
 def save_model(model, scaler, model_path='stress_rf_model.pkl', scaler_path='scaler.pkl'):
@@ -33,8 +42,10 @@ def load_model(model_path='best_wesad_xgboost_con_smote_model_v2.pkl'):
     - pipeline: Pipeline completo (scaler + smote + modelo)
     
     NOTA: Requiere sklearn 1.7.1 e imbalanced-learn
+    El archivo se deserializa una sola vez por proceso (registro_modelos) y
+    se vuelve a cargar solo si cambia en disco.
     """
-    pipeline = joblib.load(model_path)
+    pipeline = obtener_modelo(model_path)
     print(f"Pipeline CON SMOTE cargado desde {model_path}")
     return pipeline
 
@@ -65,6 +76,133 @@ def predict_stress(bvp, temp, eda, pipeline):
     return int(prediction)
 
 
+def _como_dataframe(lecturas):
+    """
+    Convierte un lote de lecturas al DataFrame que espera el pipeline.
+    Acepta un array (n, 3) con columnas [bvp, eda, temp] o un buffer
+    columnar (dict/DataFrame) con las claves 'bvp', 'eda' y 'temp'.
+    """
+    import pandas as pd
+
+    if isinstance(lecturas, pd.DataFrame):
+        return lecturas[FEATURES]
+
+    if hasattr(lecturas, 'keys'):
+        columnas = {f: np.asarray(lecturas[f], dtype=np.float64).ravel() for f in FEATURES}
+        return pd.DataFrame(columnas, columns=FEATURES, copy=False)
+
+    matriz = np.asarray(lecturas, dtype=np.float64)
+    if matriz.ndim == 1:
+        matriz = matriz.reshape(1, -1)
+    if matriz.ndim != 2 or matriz.shape[1] != len(FEATURES):
+        raise ValueError(f"Se esperaba un array (n, {len(FEATURES)}) con columnas {FEATURES}, "
+                         f"se recibió forma {matriz.shape}")
+    return pd.DataFrame(matriz, columns=FEATURES, copy=False)
+
+
+def predict_stress_batch(lecturas, pipeline, umbral=UMBRAL_ESTRES):
+    """
+    Predicción vectorizada de estrés para un lote de lecturas.
+    Parámetros:
+    - lecturas: Array (n, 3) con columnas [bvp, eda, temp] o buffer columnar
+      (dict/DataFrame con claves 'bvp', 'eda', 'temp')
+    - pipeline: Pipeline completo (scaler + smote + modelo XGBoost)
+    - umbral: Probabilidad de estrés a partir de la cual se etiqueta 1
+
+    Retorna:
+    - etiquetas: Array (n,) de enteros, 1 (estrés) o 0 (no estrés)
+    - probabilidades: Array (n, 2) con [P(sin estrés), P(estrés)]
+
+    Usa una sola llamada a predict_proba; con el umbral por defecto (> 0.5)
+    la etiqueta es la misma que da XGBClassifier.predict, así que coincide
+    con predict_stress fila a fila.
+    """
+    X = _como_dataframe(lecturas)
+    probabilidades = pipeline.predict_proba(X)
+    etiquetas = (probabilidades[:, 1] > umbral).astype(int)
+    return etiquetas, probabilidades
+
+
+class ResultadoInferencia:
+    """
+    Resultado de una única evaluación del pipeline sobre una lectura.
+    Agrupa la etiqueta, las probabilidades, el umbral aplicado y la latencia.
+    """
+
+    def __init__(self, prediccion, probabilidades, umbral, latencia_ms):
+        self.prediccion = int(prediccion)
+        self.probabilidades = probabilidades
+        self.umbral = umbral
+        self.latencia_ms = latencia_ms
+
+    @property
+    def prob_sin_estres(self):
+        return float(self.probabilidades[0])
+
+    @property
+    def prob_con_estres(self):
+        return float(self.probabilidades[1])
+
+    def __repr__(self):
+        return (f"ResultadoInferencia(prediccion={self.prediccion}, "
+                f"prob_con_estres={self.prob_con_estres:.4f}, umbral={self.umbral}, "
+                f"latencia_ms={self.latencia_ms:.3f})")
+
+
+_hist_inferencia = histograma('modelo_inferencia_ms', 'Llamada al pipeline por lectura (ms)')
+_aciertos_cache = contador('modelo_aciertos_cache', 'Lecturas resueltas con el resultado memorizado')
+
+
+class PredictorEstres:
+    """
+    Envuelve el pipeline y memoriza el resultado de la última lectura.
+    Los eventos de los sliders y el loop de envío periódico comparten la
+    misma instancia, así que una lectura sin cambios no vuelve a evaluarse.
+    """
+
+    def __init__(self, pipeline, umbral=UMBRAL_ESTRES, calibracion=None):
+        self.pipeline = pipeline
+        self.umbral = umbral
+        # CalibracionUsuario opcional: la lectura se lleva a la escala de la población
+        # antes del pipeline (quien recibe las lecturas reales llama a calibracion.actualizar)
+        self.calibracion = calibracion
+        self._referencia = None
+        if calibracion is not None:
+            from calibracion_usuario import referencia_poblacion
+            self._referencia = referencia_poblacion(pipeline)
+        self.evaluaciones = 0
+        self.aciertos_cache = 0
+        # (entrada, resultado) se reemplaza de una vez para que sea consistente
+        self._ultimo = None
+
+    def predecir(self, bvp, temp, eda):
+        """
+        Retorna un ResultadoInferencia para la lectura (bvp, temp, eda).
+        Si la lectura (ya calibrada) es idéntica a la anterior se reutiliza el resultado.
+        """
+        valores = [float(bvp), float(eda), float(temp)]
+        if self.calibracion is not None:
+            valores = self.calibracion.calibrar(valores, *self._referencia)
+        entrada = tuple(valores)
+        ultimo = self._ultimo
+        if ultimo is not None and ultimo[0] == entrada:
+            self.aciertos_cache += 1
+            _aciertos_cache.inc()
+            return ultimo[1]
+
+        inicio = time.perf_counter()
+        etiquetas, probabilidades = predict_stress_batch(
+            [entrada], self.pipeline, self.umbral
+        )
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        _hist_inferencia.observar(latencia_ms)
+
+        resultado = ResultadoInferencia(etiquetas[0], probabilidades[0], self.umbral, latencia_ms)
+        self._ultimo = (entrada, resultado)
+        self.evaluaciones += 1
+        return resultado
+
+
 if __name__ == "__main__":
     # Cargar el pipeline
     pipeline = load_model()
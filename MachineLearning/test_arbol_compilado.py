@@ -0,0 +1,107 @@
+"""
+Paridad del modelo compilado (arbol_compilado) con el pipeline .pkl
+
+Las filas salen del constructor de shards (dataset_wesad.procesar_sujeto):
+- siempre: un sujeto sintético con el formato del .pkl de WESAD (señales de muñeca
+  a sus frecuencias nativas, etiquetas a 700 Hz, tramos de línea base y de estrés)
+- si RUTA_WESAD apunta a la carpeta de WESAD: el sujeto reservado SUJETO_RESERVADO
+
+Uso:
+    python -m pytest MachineLearning/test_arbol_compilado.py
+    python MachineLearning/test_arbol_compilado.py
+"""
+
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, DIRECTORIO)
+
+from arbol_compilado import exportar_modelo  # noqa: E402
+from dataset_wesad import CONFIG_DATASET, FRECUENCIAS_MUNECA, procesar_sujeto  # noqa: E402
+from stress_model import FEATURES, UMBRAL_ESTRES, load_model  # noqa: E402
+
+RUTA_MODELO = os.path.join(DIRECTORIO, 'best_wesad_xgboost_con_smote_model_v2.pkl')
+SUJETO_RESERVADO = 'S17'
+TOLERANCIA = 1e-6
+
+# Tramos del sujeto sintético: (etiqueta WESAD, segundos, eda, temp, amplitud bvp)
+TRAMOS = [(1, 600, 0.8, 33.6, 20.0), (2, 600, 3.0, 33.0, 40.0), (3, 300, 1.5, 33.3, 25.0)]
+
+
+def _sujeto_sintetico(ruta, semilla=7):
+    """Escribe un .pkl con la estructura de WESAD (data['signal']['wrist'], data['label'])."""
+    rng = np.random.default_rng(semilla)
+    hz_etiquetas = CONFIG_DATASET['sampling_rate_hz']
+    senales = {'ACC': [], 'BVP': [], 'EDA': [], 'TEMP': []}
+    etiquetas = []
+    for etiqueta, segundos, eda, temp, amplitud in TRAMOS:
+        t = np.arange(segundos * FRECUENCIAS_MUNECA['bvp']) / FRECUENCIAS_MUNECA['bvp']
+        senales['BVP'].append(amplitud * np.sin(2 * np.pi * 1.2 * t) + rng.normal(0, 5, t.size))
+        n_lentas = segundos * FRECUENCIAS_MUNECA['eda']
+        senales['EDA'].append(eda + np.cumsum(rng.normal(0, 0.01, n_lentas)))
+        senales['TEMP'].append(temp + rng.normal(0, 0.03, n_lentas))
+        senales['ACC'].append(rng.normal(0, 10, (segundos * FRECUENCIAS_MUNECA['acc'], 3)))
+        etiquetas.append(np.full(segundos * hz_etiquetas, etiqueta))
+    datos = {
+        'signal': {'wrist': {
+            'ACC': np.concatenate(senales['ACC']),
+            'BVP': np.concatenate(senales['BVP'])[:, None],
+            'EDA': np.concatenate(senales['EDA'])[:, None],
+            'TEMP': np.concatenate(senales['TEMP'])[:, None],
+        }},
+        'label': np.concatenate(etiquetas),
+    }
+    with open(ruta, 'wb') as f:
+        pickle.dump(datos, f)
+
+
+def _filas(ruta_pkl, subject):
+    columnas = procesar_sujeto(subject, ruta_pkl, CONFIG_DATASET)
+    return np.column_stack([columnas[c] for c in FEATURES])
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    return load_model(RUTA_MODELO)
+
+
+@pytest.fixture(scope='module')
+def compilado(pipeline, tmp_path_factory):
+    return exportar_modelo(pipeline, str(tmp_path_factory.mktemp('compilado') / 'modelo.npz'))
+
+
+def _comprobar_paridad(pipeline, compilado, X):
+    import pandas as pd
+
+    proba_ref = pipeline.predict_proba(pd.DataFrame(X, columns=FEATURES))[:, 1]
+    proba = compilado.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(proba, proba_ref, rtol=0, atol=TOLERANCIA)
+    en_frontera = np.abs(proba_ref - UMBRAL_ESTRES) <= TOLERANCIA
+    iguales = (proba > UMBRAL_ESTRES) == (proba_ref > UMBRAL_ESTRES)
+    assert (iguales | en_frontera).all(), f"{int((~iguales).sum())} etiquetas distintas"
+    return proba_ref > UMBRAL_ESTRES
+
+
+def test_paridad_sujeto_sintetico(pipeline, compilado, tmp_path):
+    ruta = str(tmp_path / 'S99.pkl')
+    _sujeto_sintetico(ruta)
+    X = _filas(ruta, 'S99')
+    assert len(X) == sum(t[1] for t in TRAMOS)
+    etiquetas = _comprobar_paridad(pipeline, compilado, X)
+    # La comparación de etiquetas solo dice algo si aparecen las dos clases
+    assert etiquetas.any() and not etiquetas.all()
+
+
+@pytest.mark.skipif(not os.environ.get('RUTA_WESAD'), reason="RUTA_WESAD no definida")
+def test_paridad_sujeto_reservado(pipeline, compilado):
+    ruta = os.path.join(os.environ['RUTA_WESAD'], SUJETO_RESERVADO, f"{SUJETO_RESERVADO}.pkl")
+    _comprobar_paridad(pipeline, compilado, _filas(ruta, SUJETO_RESERVADO))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
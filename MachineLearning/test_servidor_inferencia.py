@@ -0,0 +1,78 @@
+"""
+Alertas del servidor de inferencia con muchas sesiones a la vez
+Cada sesión estresada debe recibir su propia alerta: el límite de aperturas del
+motor es por sesión, no compartido entre todos los dispositivos.
+
+Uso:
+    python -m pytest MachineLearning/test_servidor_inferencia.py
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, DIRECTORIO)
+
+from protocolo_alertas import LectorTramas, empaquetar, empaquetar_registros  # noqa: E402
+from servidor_inferencia import ServidorInferencia  # noqa: E402
+from stress_model import load_model  # noqa: E402
+
+RUTA_MODELO = os.path.join(DIRECTORIO, 'best_wesad_xgboost_con_smote_model_v2.pkl')
+# Lectura que el modelo clasifica como estrés (igual que en benchmark_modelo)
+LECTURA_ESTRES = {'bvp': 0.6, 'eda': 3.0, 'temp': 33.0}
+DISPOSITIVOS = 40
+LECTURAS = 4
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    return load_model(RUTA_MODELO)
+
+
+async def _dispositivo(puerto, usuario):
+    """Negocia el formato binario, envía lecturas de estrés y espera la alerta."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', puerto)
+    writer.write(empaquetar({'tipo': 'negociar', 'formatos': ['binario-v1'], 'usuario': usuario}))
+    lector = LectorTramas()
+    for seq in range(LECTURAS):
+        writer.write(empaquetar_registros([dict(LECTURA_ESTRES, seq=seq)]))
+        await writer.drain()
+        await asyncio.sleep(0.01)
+    alertas = []
+    try:
+        while not alertas:
+            datos = await asyncio.wait_for(reader.read(4096), 5)
+            if not datos:
+                break
+            alertas = [m for m in lector.alimentar(datos) if m.get('tipo') == 'alerta']
+    except asyncio.TimeoutError:
+        pass
+    writer.close()
+    return alertas
+
+
+def test_alerta_por_sesion_concurrente(pipeline):
+    async def escenario():
+        servidor = ServidorInferencia(pipeline)
+        red = await servidor.iniciar(port=0)
+        puerto = red.sockets[0].getsockname()[1]
+        try:
+            resultados = await asyncio.gather(
+                *(_dispositivo(puerto, f"reloj-{i:03d}") for i in range(DISPOSITIVOS)))
+        finally:
+            red.close()
+            await red.wait_closed()
+            servidor.planificador.detener()
+        return servidor, resultados
+
+    servidor, resultados = asyncio.run(escenario())
+    sin_alerta = [i for i, alertas in enumerate(resultados) if not alertas]
+    assert not sin_alerta, f"{len(sin_alerta)} de {DISPOSITIVOS} sesiones sin alerta"
+    assert servidor.motor.estadisticas['limitadas'] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
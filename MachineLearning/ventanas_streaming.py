@@ -0,0 +1,233 @@
+"""
+Extractor de ventanas en streaming para las señales de la muñeca (Empatica E4)
+Convierte un flujo de muestras (BVP a 64 Hz, EDA y TEMP a 4 Hz) en ventanas
+como las de window_reduce del notebook, sin volver a recorrer el historial:
+cada muestra actualiza media, desviación, mínimo, máximo y pendiente en O(1).
+"""
+
+from collections import deque
+
+import numpy as np
+
+from stress_model import FEATURES, predict_stress_batch
+
+# Frecuencias nativas del Empatica E4 (Hz)
+FRECUENCIAS_E4 = {'bvp': 64, 'eda': 4, 'temp': 4}
+
+# Cada cuántas muestras se recalculan las sumas desde el buffer para acotar el error numérico
+_MUESTRAS_RECALCULO = 1 << 16
+
+
+class EstadisticaDeslizante:
+    """
+    Estadísticas de las últimas 'tamano' muestras de un canal.
+    - Buffer circular NumPy para los valores
+    - Sumas acumuladas para media, varianza y pendiente (mínimos cuadrados)
+    - Colas monótonas para mínimo y máximo (O(1) amortizado)
+    """
+
+    def __init__(self, tamano, frecuencia=1.0):
+        self.tamano = int(tamano)
+        self.frecuencia = float(frecuencia)
+        self.buffer = np.zeros(self.tamano, dtype=np.float64)
+        self.total = 0          # muestras recibidas desde el inicio
+        self._origen = 0        # índice de referencia para la pendiente
+        self._s_x = 0.0
+        self._s_xx = 0.0
+        self._s_kx = 0.0        # suma de (k - origen) * x
+        self._minimos = deque()
+        self._maximos = deque()
+
+    @property
+    def n(self):
+        return min(self.total, self.tamano)
+
+    @property
+    def lleno(self):
+        return self.total >= self.tamano
+
+    def agregar(self, valor):
+        """Añade una muestra y descarta la más antigua si el buffer está lleno."""
+        valor = float(valor)
+        k = self.total
+        pos = k % self.tamano
+
+        if k >= self.tamano:
+            viejo = self.buffer[pos]
+            self._s_x -= viejo
+            self._s_xx -= viejo * viejo
+            self._s_kx -= (k - self.tamano - self._origen) * viejo
+
+        self.buffer[pos] = valor
+        self._s_x += valor
+        self._s_xx += valor * valor
+        self._s_kx += (k - self._origen) * valor
+        self.total = k + 1
+
+        primero = self.total - self.n
+        while self._minimos and self._minimos[-1][1] >= valor:
+            self._minimos.pop()
+        self._minimos.append((k, valor))
+        while self._minimos[0][0] < primero:
+            self._minimos.popleft()
+
+        while self._maximos and self._maximos[-1][1] <= valor:
+            self._maximos.pop()
+        self._maximos.append((k, valor))
+        while self._maximos[0][0] < primero:
+            self._maximos.popleft()
+
+        if self.total % _MUESTRAS_RECALCULO == 0:
+            self._recalcular()
+
+    def _recalcular(self):
+        """Rehace las sumas desde el buffer (O(tamano), cada _MUESTRAS_RECALCULO muestras)."""
+        valores = self.ventana()
+        self._origen = self.total - len(valores)
+        indices = np.arange(len(valores), dtype=np.float64)
+        self._s_x = float(valores.sum())
+        self._s_xx = float(np.dot(valores, valores))
+        self._s_kx = float(np.dot(indices, valores))
+
+    def ventana(self):
+        """Copia de las muestras actuales en orden cronológico."""
+        if not self.lleno:
+            return self.buffer[:self.total].copy()
+        pos = self.total % self.tamano
+        return np.concatenate([self.buffer[pos:], self.buffer[:pos]])
+
+    @property
+    def media(self):
+        return self._s_x / self.n if self.n else float('nan')
+
+    @property
+    def desviacion(self):
+        n = self.n
+        if n == 0:
+            return float('nan')
+        varianza = self._s_xx / n - (self._s_x / n) ** 2
+        return float(np.sqrt(max(varianza, 0.0)))
+
+    @property
+    def minimo(self):
+        return self._minimos[0][1] if self._minimos else float('nan')
+
+    @property
+    def maximo(self):
+        return self._maximos[0][1] if self._maximos else float('nan')
+
+    @property
+    def pendiente(self):
+        """Pendiente de la recta de mínimos cuadrados, en unidades por segundo."""
+        n = self.n
+        if n < 2:
+            return 0.0
+        # Índices de la ventana relativos al origen: a, a+1, ..., a+n-1
+        a = self.total - n - self._origen
+        s_k = n * a + n * (n - 1) / 2
+        s_kk = n * a * a + a * n * (n - 1) + (n - 1) * n * (2 * n - 1) / 6
+        denominador = n * s_kk - s_k * s_k
+        return (n * self._s_kx - s_k * self._s_x) / denominador * self.frecuencia
+
+    def resumen(self):
+        return {
+            'mean': self.media,
+            'std': self.desviacion,
+            'min': self.minimo,
+            'max': self.maximo,
+            'slope': self.pendiente,
+        }
+
+
+class ExtractorVentanas:
+    """
+    Agrupa las muestras de varios canales con frecuencias distintas en ventanas.
+    Cada canal tiene su propia EstadisticaDeslizante de segundos_ventana * frecuencia
+    muestras; una ventana se cierra cada segundos_paso, cuando todos los canales
+    han recibido datos hasta ese instante.
+    Las muestras de un canal que ya llegó al próximo cierre esperan en una cola
+    hasta que se cierra la ventana, así que los canales pueden llegar en bloques
+    (p. ej. 10 s de BVP y luego 10 s de EDA) sin desalinear las ventanas.
+    """
+
+    def __init__(self, frecuencias=None, segundos_ventana=1.0, segundos_paso=1.0):
+        self.frecuencias = dict(frecuencias or FRECUENCIAS_E4)
+        self.segundos_ventana = segundos_ventana
+        self.segundos_paso = segundos_paso
+        self.canales = {
+            canal: EstadisticaDeslizante(max(1, round(fs * segundos_ventana)), fs)
+            for canal, fs in self.frecuencias.items()
+        }
+        self._pendientes = {canal: deque() for canal in self.frecuencias}
+        self.ventanas_emitidas = 0
+        self._proximo_cierre = segundos_ventana
+
+    def _tiempo_canal(self, canal):
+        return self.canales[canal].total / self.frecuencias[canal]
+
+    def agregar(self, canal, valor):
+        """
+        Añade una muestra de 'canal'.
+        Retorna el diccionario de la ventana si con esta muestra se cierra una, o None.
+        """
+        if self._pendientes[canal] or self._tiempo_canal(canal) >= self._proximo_cierre:
+            # Pertenece a una ventana posterior: espera a que se cierre la actual
+            self._pendientes[canal].append(valor)
+        else:
+            self.canales[canal].agregar(valor)
+        return self._cerrar()
+
+    def _cerrar(self):
+        """Cierra la ventana en curso si todos los canales llegaron a su fin; si no, None."""
+        if any(self._tiempo_canal(c) < self._proximo_cierre for c in self.canales):
+            return None
+
+        ventana = {
+            'inicio': self._proximo_cierre - self.segundos_ventana,
+            'fin': self._proximo_cierre,
+            'caracteristicas': self.caracteristicas(),
+            'modelo': self.vector_modelo(),
+        }
+        self.ventanas_emitidas += 1
+        self._proximo_cierre += self.segundos_paso
+
+        for c, pendientes in self._pendientes.items():
+            while pendientes and self._tiempo_canal(c) < self._proximo_cierre:
+                self.canales[c].agregar(pendientes.popleft())
+        return ventana
+
+    def agregar_lote(self, canal, valores):
+        """Añade varias muestras seguidas de un canal; retorna la lista de ventanas cerradas."""
+        ventanas = []
+        for valor in valores:
+            ventana = self.agregar(canal, valor)
+            while ventana is not None:
+                ventanas.append(ventana)
+                # Las muestras en cola pueden completar también las ventanas siguientes
+                ventana = self._cerrar()
+        return ventanas
+
+    def caracteristicas(self):
+        """Diccionario plano {canal_estadistica: valor} de la ventana actual."""
+        resultado = {}
+        for canal, estadistica in self.canales.items():
+            for nombre, valor in estadistica.resumen().items():
+                resultado[f"{canal}_{nombre}"] = valor
+        return resultado
+
+    def vector_modelo(self):
+        """
+        Entrada del pipeline actual: media por ventana de [bvp, eda, temp],
+        igual que window_reduce en el notebook de entrenamiento.
+        """
+        return [self.canales[f].media for f in FEATURES]
+
+
+def predecir_ventanas(ventanas, pipeline):
+    """
+    Evalúa en una sola llamada una lista de ventanas emitidas por ExtractorVentanas.
+    Retorna (etiquetas, probabilidades) como predict_stress_batch.
+    """
+    if not ventanas:
+        return np.zeros(0, dtype=int), np.zeros((0, 2))
+    return predict_stress_batch([v['modelo'] for v in ventanas], pipeline)
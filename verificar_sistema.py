@@ -3,6 +3,7 @@ Script de verificación del sistema StressGuard
 Verifica que todos los componentes necesarios estén instalados y funcionando
 """
 
+import os
 import sys
 
 def verificar_dependencias():
@@ -138,16 +139,21 @@ def verificar_modelo_ml():
     from pathlib import Path
     
     base_dir = Path(__file__).parent
-    modelo_path = base_dir / 'MachineLearning' / 'best_wesad_xgboost_no_smote_model.pkl'
+    ml_dir = base_dir / 'MachineLearning'
+    modelo_path = ml_dir / 'best_wesad_xgboost_con_smote_model_v2.pkl'
     
     if modelo_path.exists():
         print(f"✅ Modelo encontrado: {modelo_path.name}")
         
-        # Intentar cargar el modelo
+        # Intentar cargar el modelo (a través del registro compartido)
         try:
-            import joblib
-            pipeline = joblib.load(modelo_path)
-            print("✅ Modelo se carga correctamente")
+            if str(ml_dir) not in sys.path:
+                sys.path.insert(0, str(ml_dir))
+            from registro_modelos import obtener_modelo, metricas_modelos
+            
+            obtener_modelo(modelo_path)
+            metricas = metricas_modelos()[os.path.abspath(modelo_path)]
+            print(f"✅ Modelo se carga correctamente ({metricas['ultima_carga_ms']:.0f} ms)")
             return True
         except Exception as e:
             print(f"⚠️  Error al cargar modelo: {e}")